@@ -0,0 +1,72 @@
+"""Concurrent /guides and /auth/user_info requests, with blocking and with async database access"""
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session, sessionmaker
+
+from benchmarks.common import report, run_clients
+from benchmarks.conftest import BENCH_CLIENTS
+from core.dependencies import get_db
+from core.settings import AUTH_TOKEN
+from main import app
+from tests.database import TEST_DATABASE_URL
+from utils.auth import create_auth_token
+
+REQUESTS = 2000
+
+pytestmark = pytest.mark.anyio
+
+
+class BlockingSession:
+    """AsyncSession interface over a sync session, whose queries block the event loop
+
+    This is how services ran queries before the async database layer, through psycopg2. Rows are
+    buffered and the connection returned after every query: holding it until the response is sent,
+    as the old layout did, runs the pool dry at this concurrency and blocks the loop on it for good.
+    Numbers of the blocking layout are the best it could do.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.session, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if isinstance(result, Result):
+                result = result.freeze()()
+            self.session.commit()
+            return result
+
+        return call
+
+
+async def bench_concurrent_requests(client: httpx.AsyncClient, session_factory, without_caches):
+    client.cookies.set(AUTH_TOKEN, await create_auth_token(1))
+    sync_engine = create_engine(TEST_DATABASE_URL.replace("+asyncpg", "+psycopg2"))
+    blocking_session_factory = sessionmaker(bind=sync_engine, expire_on_commit=False)
+
+    async def get_blocking_db():
+        with blocking_session_factory() as session:
+            yield BlockingSession(session)
+
+    async def get_guides() -> None:
+        (await client.get("/guides", params={"page": 3, "page_size": 20})).raise_for_status()
+
+    async def get_user_info() -> None:
+        (await client.get("/auth/user_info")).raise_for_status()
+
+    results = {}
+    async_get_db = app.dependency_overrides[get_db]
+    for name, get_bench_db in (("blocking", get_blocking_db), ("async", async_get_db)):
+        app.dependency_overrides[get_db] = get_bench_db
+        results[f"/guides {name}"] = await run_clients(BENCH_CLIENTS, REQUESTS, get_guides)
+        results[f"/auth/user_info {name}"] = await run_clients(BENCH_CLIENTS, REQUESTS,
+                                                               get_user_info)
+    sync_engine.dispose()
+
+    report(f"{BENCH_CLIENTS} concurrent clients, caches bypassed", results)
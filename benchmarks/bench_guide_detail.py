@@ -0,0 +1,61 @@
+"""Guide detail: ORM guide with relationships loaded one by one against the single query path"""
+from itertools import cycle
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from benchmarks.common import report, run_clients
+from benchmarks.conftest import BENCH_CLIENTS, BENCH_GUIDES_PER_USER, BENCH_USERS
+from core.models import Guide, User, UserDetail
+from guides import service
+from guides.schemas import GuideReadSchema
+from tests.database import record_queries
+from utils.http import SerializedResponse, make_etag
+
+REQUESTS = 2000
+# Guide ids spread over the seeded guides, so requests don't hit the same rows
+GUIDE_IDS_STEP = 37
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_orm_guide_detail(db: AsyncSession, guide_id: int) -> SerializedResponse | None:
+    """Guide detail as it was built before its read path: guide, then author, details, profession
+
+    Each relationship is its own query, as lazy loads of `GuideReadSchema` walking them were.
+    """
+    guide: Guide = await db.get(Guide, guide_id, options=(
+        selectinload(Guide.user).selectinload(User.user_details)
+        .selectinload(UserDetail.profession),))
+    if not guide:
+        return None
+    content: bytes = GuideReadSchema.model_validate(guide).model_dump_json(by_alias=True).encode()
+    return SerializedResponse(content=content, etag=make_etag(content),
+                              last_modified=guide.last_modified)
+
+
+async def bench_guide_detail_throughput(client: httpx.AsyncClient, engine, monkeypatch,
+                                        without_caches):
+    guides = BENCH_USERS * BENCH_GUIDES_PER_USER
+    guide_ids = cycle(number * GUIDE_IDS_STEP % guides + 1 for number in range(REQUESTS))
+
+    async def get_guide() -> None:
+        (await client.get(f"/guides/guide/{next(guide_ids)}")).raise_for_status()
+
+    results = {}
+    queries = {}
+    with monkeypatch.context() as patch:
+        patch.setattr(service, "get_serialized_guide_detail", get_orm_guide_detail)
+        with record_queries(engine) as recorded:
+            results["ORM relationships"] = await run_clients(BENCH_CLIENTS, REQUESTS, get_guide)
+        queries["ORM relationships"] = len(recorded) / REQUESTS
+    with record_queries(engine) as recorded:
+        results["single query"] = await run_clients(BENCH_CLIENTS, REQUESTS, get_guide)
+    queries["single query"] = len(recorded) / REQUESTS
+
+    report(f"GET /guides/guide/{{guide_id}}, {BENCH_CLIENTS} concurrent clients, "
+           f"cache bypassed", results)
+    for name, count in queries.items():
+        print(f"{name:<28}{count:>10.1f} queries per request")
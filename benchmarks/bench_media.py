@@ -0,0 +1,93 @@
+"""Media throughput of 1 MB images: StaticFiles against MediaFiles, served by uvicorn"""
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+import pytest
+
+from benchmarks.common import report, run_clients
+from tests.conftest import TEST_ENVIRONMENT
+
+CLIENTS = 500
+REQUESTS = 2000
+IMAGE_BYTES = 1024 * 1024
+RANGE = "bytes=0-65535"
+SERVER_START_SECONDS = 10
+
+pytestmark = pytest.mark.anyio
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(media_root: str, files: str, accel_redirect_prefix: str | None = None) \
+        -> Iterator[str]:
+    """Run uvicorn with media_app in its own process, so clients don't share its event loop"""
+    port: int = get_free_port()
+    environment = {**os.environ, **TEST_ENVIRONMENT, "BENCH_MEDIA_ROOT": media_root,
+                   "BENCH_MEDIA_FILES": files,
+                   "PYTHONPATH": os.pathsep.join((".", "src", os.getenv("PYTHONPATH", "")))}
+    if accel_redirect_prefix:
+        environment["MEDIA_ACCEL_REDIRECT_PREFIX"] = accel_redirect_prefix
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.media_app:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log", "--backlog", str(CLIENTS * 2)],
+        env=environment)
+    try:
+        deadline: float = time.monotonic() + SERVER_START_SECONDS
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port)).close()
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def bench_media_throughput(tmp_path):
+    (tmp_path / "image.jpg").write_bytes(os.urandom(IMAGE_BYTES))
+    limits = httpx.Limits(max_connections=CLIENTS, max_keepalive_connections=CLIENTS)
+
+    results = {}
+    for name, files, accel_redirect_prefix in (("StaticFiles", "static", None),
+                                               ("MediaFiles", "media", None),
+                                               ("MediaFiles X-Accel", "media", "/internal/")):
+        with run_server(str(tmp_path), files, accel_redirect_prefix) as base_url:
+            async with httpx.AsyncClient(base_url=base_url, limits=limits,
+                                         timeout=None) as client:
+                etag: str | None = (await client.get("/media/image.jpg")).headers.get("etag")
+
+                async def get_image(headers: dict[str, str] | None = None,
+                                    expected_status: int = 200) -> None:
+                    response = await client.get("/media/image.jpg", headers=headers)
+                    assert response.status_code == expected_status
+
+                async def get() -> None:
+                    await get_image()
+
+                async def revalidate() -> None:
+                    await get_image({"if-none-match": etag}, 304)
+
+                async def get_range() -> None:
+                    await get_image({"range": RANGE}, 200 if files == "static" else 206)
+
+                results[f"{name} GET"] = await run_clients(CLIENTS, REQUESTS, get)
+                if not accel_redirect_prefix:
+                    results[f"{name} 304"] = await run_clients(CLIENTS, REQUESTS, revalidate)
+                    results[f"{name} range"] = await run_clients(CLIENTS, REQUESTS, get_range)
+
+    report(f"{IMAGE_BYTES // 1024} kB image, {CLIENTS} concurrent clients", results)
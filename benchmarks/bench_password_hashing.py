@@ -0,0 +1,64 @@
+"""/guides latency while logins are hammered, with bcrypt inline and in the password pool"""
+import anyio
+import httpx
+import pytest
+from sqlalchemy import update
+
+from auth import manager, service
+from benchmarks.common import report, run_clients
+from core.models import User
+from utils.auth import bcrypt_context, get_password_hash
+
+GUIDES_REQUESTS = 1000
+# Few enough that /guides alone doesn't saturate the loop, so stalls show in its latency
+GUIDES_CLIENTS = 10
+LOGIN_CLIENTS = 4
+PASSWORD = "benchmark-password"
+
+pytestmark = pytest.mark.anyio
+
+
+async def verify_and_update_password_inline(plain_password: str,
+                                            hashed_password: str) -> tuple[bool, str | None]:
+    """Password verification as it was before the password pool, on the event loop thread"""
+    return bcrypt_context.verify_and_update(plain_password, hashed_password)
+
+
+async def do_not_throttle(request, email: str) -> None:
+    return None
+
+
+async def bench_guides_latency_during_logins(client: httpx.AsyncClient, session_factory,
+                                             monkeypatch):
+    async with session_factory() as db:
+        await db.execute(update(User).filter(User.user_id == 1)
+                         .values(password=await get_password_hash(PASSWORD)))
+        await db.commit()
+    # Every login has to reach the password check
+    monkeypatch.setattr(service, "throttle_login", do_not_throttle)
+
+    async def get_guides() -> None:
+        (await client.get("/guides", params={"page": 3, "page_size": 20})).raise_for_status()
+
+    async def log_in_repeatedly() -> None:
+        while True:
+            (await client.post("/auth/login", json={"email": "user1@example.com",
+                                                    "password": PASSWORD})).raise_for_status()
+
+    async def get_guides_during_logins():
+        async with anyio.create_task_group() as task_group:
+            for _ in range(LOGIN_CLIENTS):
+                task_group.start_soon(log_in_repeatedly)
+            result = await run_clients(GUIDES_CLIENTS, GUIDES_REQUESTS, get_guides)
+            task_group.cancel_scope.cancel()
+        return result
+
+    await run_clients(GUIDES_CLIENTS, GUIDES_REQUESTS, get_guides)
+    results = {"no logins": await run_clients(GUIDES_CLIENTS, GUIDES_REQUESTS, get_guides)}
+    with monkeypatch.context() as patch:
+        patch.setattr(manager, "verify_and_update_password", verify_and_update_password_inline)
+        results["logins, bcrypt inline"] = await get_guides_during_logins()
+    results["logins, password pool"] = await get_guides_during_logins()
+
+    report(f"GET /guides, {GUIDES_CLIENTS} concurrent clients, "
+           f"{LOGIN_CLIENTS} clients logging in", results)
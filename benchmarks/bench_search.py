@@ -0,0 +1,55 @@
+"""Guide search: title ILIKE against full text search ranked by relevance"""
+from itertools import cycle
+
+import pytest
+from sqlalchemy import desc, func, select
+
+from benchmarks.common import report, run_clients
+from core.models import Guide, Profession, User, UserDetail
+from guides.service import search_guides
+from tests.database import TOPICS
+
+REQUESTS = 200
+PAGE_SIZE = 20
+
+pytestmark = pytest.mark.anyio
+
+
+async def search_by_title(db, term: str, page: int, page_size: int) -> list:
+    """Search as it was before full text search: count and page of titles containing the term"""
+    guides = select(
+        Guide.guide_id,
+        Guide.title,
+        Guide.published,
+        Guide.created_at,
+        Guide.last_modified,
+        Guide.cover_image,
+        User.first_name,
+        User.last_name,
+        UserDetail.avatar,
+        User.user_id,
+        Profession.name.label('profession')) \
+        .filter(Guide.user_id == User.user_id, User.user_id == UserDetail.user_id,
+                UserDetail.profession_id == Profession.profession_id,
+                func.coalesce(Guide.title, '').ilike(f"%{term}%"), Guide.published) \
+        .order_by(desc(Guide.last_modified))
+    await db.scalar(select(func.count()).select_from(guides.subquery()))
+    return (await db.execute(guides.offset(page * page_size).limit(page_size))).all()
+
+
+async def bench_search_latency(session_factory, without_caches):
+    terms = cycle(TOPICS)
+
+    async with session_factory() as db:
+        async def ilike() -> None:
+            await search_by_title(db, next(terms), page=0, page_size=PAGE_SIZE)
+
+        async def full_text() -> None:
+            await search_guides(db, next(terms), page=0, page_size=PAGE_SIZE)
+
+        results = {"title ILIKE": await run_clients(1, REQUESTS, ilike),
+                   "full text search": await run_clients(1, REQUESTS, full_text)}
+
+    async with session_factory() as db:
+        guides = await db.scalar(select(func.count()).select_from(Guide))
+    report(f"Search of {guides} guides, one at a time, caches bypassed", results)
@@ -0,0 +1,50 @@
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import anyio
+
+UNITS = {"ms": 1e3, "us": 1e6}
+
+
+@dataclass
+class Result:
+    latencies: list[float]
+    seconds: float
+
+    @property
+    def per_second(self) -> float:
+        return len(self.latencies) / self.seconds
+
+    def percentile(self, percent: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+async def run_clients(clients: int, requests: int, send: Callable[[], Awaitable]) -> Result:
+    """Send `requests` in total from `clients` concurrent clients, each waiting for its response"""
+    latencies: list[float] = []
+    remaining = iter(range(requests))
+
+    async def client() -> None:
+        for _ in remaining:
+            started_at = time.perf_counter()
+            await send()
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    async with anyio.create_task_group() as task_group:
+        for _ in range(clients):
+            task_group.start_soon(client)
+    return Result(latencies=latencies, seconds=time.perf_counter() - started_at)
+
+
+def report(title: str, results: dict[str, Result], unit: str = "ms") -> None:
+    print(f"\n{title}")
+    print(f"{'':<28}{'requests':>10}{'per sec':>12}"
+          f"{'p50 ' + unit:>12}{'p95 ' + unit:>12}{'p99 ' + unit:>12}")
+    for name, result in results.items():
+        scale = UNITS[unit]
+        print(f"{name:<28}{len(result.latencies):>10}{result.per_second:>12.1f}"
+              f"{result.percentile(50) * scale:>12.2f}{result.percentile(95) * scale:>12.2f}"
+              f"{result.percentile(99) * scale:>12.2f}")
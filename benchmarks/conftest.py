@@ -0,0 +1,62 @@
+import logging
+import os
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# Sets the environment read by src/config.py, before any benchmark imports the app
+import tests.conftest  # noqa: F401
+from core.dependencies import get_db
+from core.service import count_cache, guides_list_cache, guide_detail_cache, principal_cache
+from main import app
+from tests.database import TEST_DATABASE_URL, create_seeded_engine
+
+# 1M guides with BENCH_USERS=2000 BENCH_GUIDES_PER_USER=500, seeding them takes minutes
+BENCH_USERS = int(os.getenv("BENCH_USERS", "2000"))
+BENCH_GUIDES_PER_USER = int(os.getenv("BENCH_GUIDES_PER_USER", "50"))
+BENCH_CLIENTS = int(os.getenv("BENCH_CLIENTS", "200"))
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def engine() -> AsyncEngine:
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = await create_seeded_engine(BENCH_USERS, BENCH_GUIDES_PER_USER)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def session_factory(engine) -> sessionmaker:
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def client(session_factory) -> httpx.AsyncClient:
+    """Client of the app, with sessions of the benchmark database"""
+
+    async def get_bench_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_bench_db
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+    app.dependency_overrides.pop(get_db)
+
+
+@pytest.fixture
+def without_caches(monkeypatch) -> None:
+    """Every request queries the database, as it did before responses and counts were cached"""
+    for cache in (count_cache, guides_list_cache, guide_detail_cache, principal_cache):
+        monkeypatch.setattr(cache, "get", lambda key: None)
@@ -0,0 +1,15 @@
+"""App serving media files for bench_media, run by uvicorn in a process of its own
+
+BENCH_MEDIA_ROOT is the directory served, BENCH_MEDIA_FILES is "static" for Starlette's
+StaticFiles, as media were served before, or "media" for MediaFiles.
+"""
+import os
+
+from starlette.applications import Starlette
+from starlette.staticfiles import StaticFiles
+
+from utils.media_files import MediaFiles
+
+app = Starlette()
+files = MediaFiles if os.environ["BENCH_MEDIA_FILES"] == "media" else StaticFiles
+app.mount("/media", files(directory=os.environ["BENCH_MEDIA_ROOT"]), name="media")
@@ -0,0 +1,38 @@
+# scripts/calibrate_bcrypt.py
+import sys
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+# Default time one hash may take, passed in milliseconds as the first argument to override
+DEFAULT_TARGET_MS = 250
+SAMPLES = 3
+
+
+def measure_hash_time(rounds: int) -> float:
+    """Return the fastest of a few hashes with given cost, in milliseconds"""
+    hasher = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        hasher.hash("calibration password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def run_bcrypt_calibration():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TARGET_MS
+    suggested = MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed = measure_hash_time(rounds)
+        print(f"rounds={rounds}: {elapsed:.0f} ms")
+        if elapsed > target_ms:
+            break
+        suggested = rounds
+    print(f"Suggested BCRYPT_ROUNDS={suggested} for at most {target_ms:.0f} ms per hash")
+
+
+if __name__ == "__main__":
+    run_bcrypt_calibration()
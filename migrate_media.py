@@ -0,0 +1,100 @@
+# scripts/migrate_media.py
+import asyncio
+import logging
+import os
+import sys
+import uuid
+
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import MEDIA_TMP_ROOT, MEDIA_OBJECTS_ROOT, BASE_DIR
+from core.dependencies import DBSession
+from core.models import Guide, MediaObject, UserDetail
+from utils.images import INVALID_IMAGE_ERRORS, get_file_path, get_image_extension, \
+    make_image_variants, remove_image
+from utils.media import add_media_reference, get_media_path, media_cleanup_tasks, \
+    place_media_file
+from utils.uploads import write_upload
+
+# (model, path column, variants column) of every column referring to media
+MEDIA_COLUMNS = (
+    (UserDetail, UserDetail.avatar, UserDetail.avatar_variants),
+    (UserDetail, UserDetail.cover_image, UserDetail.cover_image_variants),
+    (Guide, Guide.cover_image, Guide.cover_image_variants),
+)
+
+
+async def store_existing_file(db: AsyncSession, path: str) -> MediaObject | None:
+    """Copy image into content addressed storage and add a reference to it
+
+    Returns None when the file isn't a valid image, its reference is rolled back then.
+    """
+    try:
+        extension: str = get_image_extension(path)
+    except INVALID_IMAGE_ERRORS as e:
+        logging.warning(f"Skipped {path}, it isn't a valid image: {e}")
+        return None
+    os.makedirs(MEDIA_TMP_ROOT, exist_ok=True)
+    tmp_path = os.path.join(MEDIA_TMP_ROOT, f"{uuid.uuid4().hex}.part")
+    with open(get_file_path(path), "rb") as source:
+        size, digest = write_upload(source, tmp_path, max_bytes=sys.maxsize)
+    try:
+        media = await add_media_reference(db, digest, get_media_path(digest, extension), size)
+        place_media_file(db, media, tmp_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if media.variants is None:
+        try:
+            media.variants = make_image_variants(media.path)
+        except INVALID_IMAGE_ERRORS as e:
+            logging.warning(f"Skipped {path}, making its variants failed: {e}")
+            # Also removes the file placed by this transaction
+            await db.rollback()
+            return None
+    return media
+
+
+async def migrate_column(db: AsyncSession, model, path_column, variants_column) -> int:
+    """Move files of one column, committing every row so an interrupted run can be repeated"""
+    objects_prefix: str = os.path.relpath(MEDIA_OBJECTS_ROOT, BASE_DIR) + os.sep
+    primary_key = inspect(model).primary_key[0]
+    result = await db.execute(select(primary_key).filter(path_column.isnot(None),
+                                                         path_column.notlike(f"{objects_prefix}%")))
+    moved = 0
+    for row_id in result.scalars().all():
+        # Rows are fetched one by one, a rolled back row would otherwise be expired
+        row = await db.get(model, row_id)
+        path: str = getattr(row, path_column.key)
+        variants = getattr(row, variants_column.key)
+        if not os.path.exists(get_file_path(path)):
+            logging.warning(f"Missing {path}, skipped")
+            continue
+        media = await store_existing_file(db, path)
+        if media is None:
+            continue
+        setattr(row, path_column.key, media.path)
+        setattr(row, variants_column.key, media.variants)
+        await db.commit()
+        remove_image(path, variants)
+        moved += 1
+    return moved
+
+
+async def migrate_media() -> None:
+    async with DBSession() as db:
+        for model, path_column, variants_column in MEDIA_COLUMNS:
+            moved = await migrate_column(db, model, path_column, variants_column)
+            logging.info(f"{model.__tablename__}.{path_column.key}: moved {moved} files")
+    # Files of rolled back references are removed in the background
+    await asyncio.gather(*media_cleanup_tasks)
+
+
+def run_media_migration():
+    asyncio.run(migrate_media())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_media_migration()
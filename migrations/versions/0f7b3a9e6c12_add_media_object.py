@@ -0,0 +1,32 @@
+"""add media object
+
+Revision ID: 0f7b3a9e6c12
+Revises: e8a2c5d13f67
+Create Date: 2026-10-17 18:05:47.902113
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0f7b3a9e6c12'
+down_revision = 'e8a2c5d13f67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('media_object',
+                    sa.Column('digest', sa.String(length=64), nullable=False),
+                    sa.Column('path', sa.String(length=255), nullable=False),
+                    sa.Column('size', sa.Integer(), nullable=False),
+                    sa.Column('variants', sa.JSON(), nullable=True),
+                    sa.Column('ref_count', sa.Integer(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('digest'),
+                    sa.UniqueConstraint('path'))
+
+
+def downgrade() -> None:
+    op.drop_table('media_object')
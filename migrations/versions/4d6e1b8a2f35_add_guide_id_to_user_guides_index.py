@@ -0,0 +1,33 @@
+"""add guide_id to user guides index
+
+Revision ID: 4d6e1b8a2f35
+Revises: 0f7b3a9e6c12
+Create Date: 2026-10-17 21:14:08.536271
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '4d6e1b8a2f35'
+down_revision = '0f7b3a9e6c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # guide_id is the tiebreaker of keyset pagination, without it pages of a user need a sort
+    with op.get_context().autocommit_block():
+        op.create_index('ix_guide_user_id_last_modified_guide_id', 'guide',
+                        ['user_id', 'last_modified', 'guide_id'], unique=False,
+                        postgresql_concurrently=True)
+        op.drop_index('ix_guide_user_id_last_modified', table_name='guide',
+                      postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_guide_user_id_last_modified', 'guide',
+                        ['user_id', 'last_modified'], unique=False,
+                        postgresql_concurrently=True)
+        op.drop_index('ix_guide_user_id_last_modified_guide_id', table_name='guide',
+                      postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""add email outbox
+
+Revision ID: 5b0d3e7f91a4
+Revises: c41f0e9a7d25
+Create Date: 2026-10-17 14:02:11.730815
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5b0d3e7f91a4'
+down_revision = 'c41f0e9a7d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('email_outbox',
+                    sa.Column('email_outbox_id', sa.Integer(), nullable=False),
+                    sa.Column('subject', sa.String(length=255), nullable=False),
+                    sa.Column('recipients', sa.JSON(), nullable=False),
+                    sa.Column('body', sa.JSON(), nullable=False),
+                    sa.Column('template_name', sa.String(length=255), nullable=False),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.Column('last_error', sa.Text(), nullable=True),
+                    sa.Column('created_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.Column('next_attempt_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.PrimaryKeyConstraint('email_outbox_id')
+                    )
+    op.create_index('ix_email_outbox_pending', 'email_outbox', ['next_attempt_at'], unique=False,
+                    postgresql_where=sa.text('sent_at IS NULL AND failed_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_pending', table_name='email_outbox')
+    op.drop_table('email_outbox')
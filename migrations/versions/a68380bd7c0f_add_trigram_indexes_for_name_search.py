@@ -0,0 +1,30 @@
+"""add trigram indexes for name search
+
+Revision ID: a68380bd7c0f
+Revises: be9c8d19038a
+Create Date: 2026-10-17 11:03:27.584310
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a68380bd7c0f'
+down_revision = 'be9c8d19038a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Expression must stay the same as User.full_name, otherwise searches can't use the index
+    op.create_index('ix_user_full_name_trgm', 'user',
+                    [sa.text("(first_name || ' ' || last_name) gin_trgm_ops")],
+                    unique=False, postgresql_using='gin')
+    op.create_index('ix_profession_name_trgm', 'profession', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_profession_name_trgm', table_name='profession')
+    op.drop_index('ix_user_full_name_trgm', table_name='user')
@@ -0,0 +1,34 @@
+"""add search vector to guide
+
+Revision ID: be9c8d19038a
+Revises: 87bdaebd4785
+Create Date: 2026-10-17 10:12:44.318205
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'be9c8d19038a'
+down_revision = '87bdaebd4785'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Generated column, so postgres keeps it in sync with title, note and content on every write
+    op.add_column('guide', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                    "setweight(to_tsvector('english', coalesce(note, '')), 'B') || "
+                    "setweight(to_tsvector('english', coalesce(content, '')), 'C')",
+                    persisted=True),
+        nullable=True))
+    op.create_index('ix_guide_search_vector', 'guide', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_guide_search_vector', table_name='guide', postgresql_using='gin')
+    op.drop_column('guide', 'search_vector')
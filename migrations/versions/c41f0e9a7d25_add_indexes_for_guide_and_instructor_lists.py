@@ -0,0 +1,39 @@
+"""add indexes for guide and instructor lists
+
+Revision ID: c41f0e9a7d25
+Revises: a68380bd7c0f
+Create Date: 2026-10-17 12:21:40.118034
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c41f0e9a7d25'
+down_revision = 'a68380bd7c0f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction, but it doesn't lock writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_guide_published_last_modified', 'guide',
+                        ['last_modified', 'guide_id'], unique=False,
+                        postgresql_where=sa.text('published'), postgresql_concurrently=True)
+        op.create_index('ix_guide_user_id_last_modified', 'guide',
+                        ['user_id', 'last_modified'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_user_detail_instructor_user_id', 'user_detail', ['user_id'],
+                        unique=False, postgresql_where=sa.text('is_instructor'),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_detail_instructor_user_id', table_name='user_detail',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_guide_user_id_last_modified', table_name='guide',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_guide_published_last_modified', table_name='guide',
+                      postgresql_concurrently=True)
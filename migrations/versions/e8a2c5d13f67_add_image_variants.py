@@ -0,0 +1,27 @@
+"""add image variants
+
+Revision ID: e8a2c5d13f67
+Revises: 5b0d3e7f91a4
+Create Date: 2026-10-17 16:24:05.418230
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e8a2c5d13f67'
+down_revision = '5b0d3e7f91a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user_detail', sa.Column('avatar_variants', sa.JSON(), nullable=True))
+    op.add_column('user_detail', sa.Column('cover_image_variants', sa.JSON(), nullable=True))
+    op.add_column('guide', sa.Column('cover_image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('guide', 'cover_image_variants')
+    op.drop_column('user_detail', 'cover_image_variants')
+    op.drop_column('user_detail', 'avatar_variants')
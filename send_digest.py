@@ -0,0 +1,59 @@
+# scripts/send_digest.py
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from core.constants import GUIDES_DIGEST_SUBJECT, MAIL_CHECKPOINT_ROOT
+from core.dependencies import DBSession
+from core.settings import MAIL_BULK_SMTP_POOL_SIZE, MAIL_BULK_RATE_PER_SECOND, \
+    MAIL_BULK_BATCH_SIZE, MAIL_DIGEST_DAYS, MAIL_DIGEST_MAX_GUIDES
+from guides.service import get_recently_published_guides
+from src.config import SITE_URL
+from users.service import stream_active_users
+from utils.mail.bulk import MailCheckpoint, send_bulk_mail
+from utils.mail.send_mail import conf
+from utils.mail.smtp import SMTPPool
+
+
+async def send_guides_digest(days: int) -> None:
+    # Digest covers whole days, so running the job again the same day resumes the same digest
+    since = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) \
+        - timedelta(days=days)
+    checkpoint = MailCheckpoint(os.path.join(MAIL_CHECKPOINT_ROOT,
+                                             f"guides-digest-{since:%Y-%m-%d}-{days}.json"))
+    async with DBSession() as db:
+        guides = [{"guide_id": guide.guide_id, "title": guide.title,
+                   "author": f"{guide.first_name} {guide.last_name}"}
+                  for guide in await get_recently_published_guides(db, since,
+                                                                   MAIL_DIGEST_MAX_GUIDES)]
+        if not guides:
+            print(f"No guides published since {since:%Y-%m-%d}")
+            return
+        pool = SMTPPool(conf, size=MAIL_BULK_SMTP_POOL_SIZE)
+        try:
+            stats = await send_bulk_mail(
+                stream_active_users(db, checkpoint.load(), MAIL_BULK_BATCH_SIZE),
+                subject=GUIDES_DIGEST_SUBJECT,
+                template_name="guides_digest.html",
+                body_for=lambda user: {"first_name": user.first_name, "guides": guides,
+                                       "since": f"{since:%Y-%m-%d}", "site_url": SITE_URL},
+                pool=pool,
+                rate=MAIL_BULK_RATE_PER_SECOND,
+                checkpoint=checkpoint)
+        finally:
+            await pool.close()
+    print(f"Sent {stats.sent} emails, skipped {stats.skipped}, "
+          f"{stats.per_second:.1f} per second")
+
+
+def run_guides_digest():
+    logging.basicConfig(level=logging.INFO)
+    # Number of days the digest covers, passed as the first argument to override
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else MAIL_DIGEST_DAYS
+    asyncio.run(send_guides_digest(days))
+
+
+if __name__ == "__main__":
+    run_guides_digest()
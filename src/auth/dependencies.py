@@ -1,16 +1,17 @@
-import os
-
 from jose import jwt, JOSEError
 
 from auth.exceptions import UnauthorizedException, TokenExpiredException
+from src.config import SECRET_KEY, ALGORITHM
+
+# Resolved once, not on every verification
+ALGORITHMS = [ALGORITHM]
 
 
 async def verify_token(token: str) -> dict:
     if not isinstance(token, str):
         raise UnauthorizedException()
     try:
-        payload = jwt.decode(token, key=os.getenv("SECRET_KEY"),
-                             algorithms=[os.getenv("ALGORITHM")])
+        payload = jwt.decode(token, key=SECRET_KEY, algorithms=ALGORITHMS)
         return payload
     except jwt.ExpiredSignatureError:
         raise TokenExpiredException()
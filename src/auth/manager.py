@@ -1,15 +1,15 @@
 from fastapi import Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth import schemas, service
 from auth.exceptions import InvalidCredentialsException, AccountNotVerifiedException, \
     UserAlreadyExistsException, \
     UserDoesNotExistException, AccountAlreadyVerifiedException
 from core.models import User
-from utils.auth import create_auth_token, verify_password
+from utils.auth import create_auth_token, verify_and_update_password
 
 
-async def activate_user(token: str, db: Session):
+async def activate_user(token: str, db: AsyncSession):
     user = await service.get_user_from_token(token, db)
     if user.is_active:
         raise AccountAlreadyVerifiedException()
@@ -18,17 +18,17 @@ async def activate_user(token: str, db: Session):
 
 
 async def register_user(request: Request,
-                        data: schemas.RegistrationSchemaUser, db: Session) -> User.user_id:
+                        data: schemas.RegistrationSchemaUser, db: AsyncSession) -> User.user_id:
     user: User = await service.get_user_by_email(data.email, db)
     if user:
         raise UserAlreadyExistsException()
-    new_user: User = await service.save_user(data, db)
-    await service.save_user_details(new_user.user_id, db)
-    await service.send_activation_email_to_user(request, new_user)
+    new_user: User = await service.register_user(request, data, db)
     return new_user.user_id
 
 
-async def login_user(email: str, password: str, db: Session) -> tuple[User, str]:
+async def login_user(request: Request, email: str, password: str,
+                     db: AsyncSession) -> tuple[User, str]:
+    await service.throttle_login(request, email)
     user: User = await authenticate_user(email, password, db)
     if not user.is_active:
         raise AccountNotVerifiedException()
@@ -36,22 +36,25 @@ async def login_user(email: str, password: str, db: Session) -> tuple[User, str]
     return user, token
 
 
-async def authenticate_user(email: str, password: str, db: Session) -> User:
-    user: User | None = await service.get_user_by_email(email, db)
+async def authenticate_user(email: str, password: str, db: AsyncSession) -> User:
+    # Logged in user is returned as profile, so details are loaded in the same query
+    user: User | None = await service.get_user_by_email(email, db,
+                                                        options=service.user_profile_options)
     if not user:
         raise UserDoesNotExistException()
-    passwords_match: bool = await verify_password(password,
-                                                  user.password)
+    passwords_match, new_hash = await verify_and_update_password(password, user.password)
     if not passwords_match:
         raise InvalidCredentialsException()
+    if new_hash:
+        await service.update_password_hash(user, new_hash, db)
     return user
 
 
-async def send_verification_email(request: Request, email: str, db: Session) -> None:
+async def send_verification_email(request: Request, email: str, db: AsyncSession) -> None:
     user: User = await service.get_user_by_email(email, db)
     if user is None:
         raise UserDoesNotExistException()
     elif user.is_active:
         raise AccountAlreadyVerifiedException()
-    await service.send_activation_email_to_user(request, user)
+    await service.send_activation_email_to_user(request, user, db)
     return None
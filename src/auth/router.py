@@ -1,11 +1,10 @@
 from fastapi import APIRouter, status, Request, Response, Depends
 from pydantic import EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import JSONResponse
 
 from auth import schemas, manager, service
 from core.dependencies import DBDependency
-from core.models import User
 from core.settings import AUTH_TOKEN
 from users.schemas import UserIDSchema, UserReadSchema
 
@@ -14,14 +13,15 @@ router = APIRouter()
 
 @router.post(path="/send_verification_email",
              status_code=status.HTTP_200_OK)
-async def send_verification_email(request: Request, email: EmailStr, db: Session = DBDependency):
+async def send_verification_email(request: Request, email: EmailStr,
+                                  db: AsyncSession = DBDependency):
     await manager.send_verification_email(request, email, db)
     return JSONResponse(content={"detail": "Activation email sent"})
 
 
 @router.get(path="/activate_user",
             status_code=status.HTTP_200_OK)
-async def activate_user(token: str, db: Session = DBDependency):
+async def activate_user(token: str, db: AsyncSession = DBDependency):
     await manager.activate_user(token, db)
     return JSONResponse(content={"detail": "Activation successful"}, status_code=status.HTTP_200_OK)
 
@@ -30,16 +30,16 @@ async def activate_user(token: str, db: Session = DBDependency):
              status_code=status.HTTP_201_CREATED,
              response_model=UserIDSchema)
 async def register_user(request: Request, data: schemas.RegistrationSchemaUser,
-                        db: Session = DBDependency) -> UserIDSchema:
+                        db: AsyncSession = DBDependency) -> UserIDSchema:
     user_id: int = await manager.register_user(request, data, db)
     return UserIDSchema(user_id=user_id)
 
 
 @router.post(path="/login",
              response_model=UserReadSchema)
-async def login_user(data: schemas.LoginSchema, response: Response,
-                     db: Session = DBDependency) -> UserReadSchema:
-    user, token = await manager.login_user(data.email, data.password, db)
+async def login_user(request: Request, data: schemas.LoginSchema, response: Response,
+                     db: AsyncSession = DBDependency) -> UserReadSchema:
+    user, token = await manager.login_user(request, data.email, data.password, db)
     response.set_cookie(key=AUTH_TOKEN, value=token)
     return user
 
@@ -56,5 +56,5 @@ async def logout_user():
             description="Get user object from token",
             response_model=UserReadSchema)
 async def get_user_from_token(
-        user: User = Depends(service.user_if_profile_is_active)) -> UserReadSchema:
+        user: UserReadSchema = Depends(service.principal_if_profile_is_active)) -> UserReadSchema:
     return user
@@ -1,67 +1,138 @@
 import datetime
 
 from fastapi import Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth import schemas
 from auth.exceptions import UserDoesNotExistException, UnauthorizedException
 from core.constants import ACTIVATE_ACCOUNT_SUBJECT
 from core.dependencies import DBDependency
 from core.models import User, UserDetail
-from core.settings import AUTH_TOKEN
-from src.config import TOKEN_EXP_MINUTES
-from utils.auth import create_auth_token, get_password_hash, get_base64_subject_from_token, \
-    get_decoded_sub_from_base64
-from utils.mail.send_mail import send_mail
-
-
-async def get_user_by_email(email: str, db: Session) -> User | None:
-    return db.query(User).filter(User.email == email).first()
-
-
-async def send_activation_email_to_user(request: Request, user: User):
+from core.ratelimit import RateLimiter, InMemoryTokenBuckets, RedisTokenBuckets
+from core.service import principal_cache, invalidate_principal
+from core.settings import AUTH_TOKEN, RATE_LIMIT_MAX_KEYS, LOGIN_IP_RATE_LIMIT_CAPACITY, \
+    LOGIN_IP_RATE_LIMIT_REFILL_RATE, LOGIN_EMAIL_RATE_LIMIT_CAPACITY, \
+    LOGIN_EMAIL_RATE_LIMIT_REFILL_RATE
+from src.config import TOKEN_EXP_MINUTES, RATE_LIMIT_REDIS_URL
+from utils.auth import create_auth_token, get_password_hash, get_user_id_from_token
+from users.schemas import UserReadSchema
+from users.service import user_profile_options
+from utils.mail.outbox import queue_mail, notify_outbox
+
+login_buckets = RedisTokenBuckets(RATE_LIMIT_REDIS_URL, maxsize=RATE_LIMIT_MAX_KEYS) \
+    if RATE_LIMIT_REDIS_URL else InMemoryTokenBuckets(maxsize=RATE_LIMIT_MAX_KEYS)
+login_ip_limiter = RateLimiter("login_ip", LOGIN_IP_RATE_LIMIT_CAPACITY,
+                               LOGIN_IP_RATE_LIMIT_REFILL_RATE, login_buckets)
+login_email_limiter = RateLimiter("login_email", LOGIN_EMAIL_RATE_LIMIT_CAPACITY,
+                                  LOGIN_EMAIL_RATE_LIMIT_REFILL_RATE, login_buckets)
+
+
+async def throttle_login(request: Request, email: str) -> None:
+    """Reject login attempt when its client or email made too many attempts recently
+
+    Client address is the one forwarded by a trusted proxy (see FORWARDED_ALLOW_IPS), otherwise
+    every client behind the proxy would share its address and bucket. Email is limited on its own,
+    so attempts on one account spread over many clients are throttled too.
+    Runs before looking up the user or checking the password, so bursts cost neither.
+    """
+    await login_ip_limiter.check(request.client.host if request.client else "unknown")
+    await login_email_limiter.check(email.strip().lower())
+
+
+async def get_user_by_email(email: str, db: AsyncSession, options: tuple = ()) -> User | None:
+    result = await db.execute(select(User).filter(User.email == email).options(*options))
+    return result.scalars().first()
+
+
+async def queue_activation_email(request: Request, user: User, db: AsyncSession) -> None:
+    """Add activation email to the outbox, it's sent only if the caller commits"""
     token = await create_auth_token(user.user_id)
     base_url = str(request.base_url)
     verification_url: str = f"{base_url}auth/verify_email?token={token}"
     expiration_time: datetime = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
         minutes=int(TOKEN_EXP_MINUTES))
-    await send_mail(subject=ACTIVATE_ACCOUNT_SUBJECT,
-                    recipients=[user.email],
-                    body={"first_name": user.first_name, "url": verification_url,
-                          "expire_at": expiration_time.strftime("%Y-%m-%d %H:%M:%S")},
-                    template_name="activation_email.html")
+    await queue_mail(db, subject=ACTIVATE_ACCOUNT_SUBJECT,
+                     recipients=[user.email],
+                     body={"first_name": user.first_name, "url": verification_url,
+                           "expire_at": expiration_time.strftime("%Y-%m-%d %H:%M:%S")},
+                     template_name="activation_email.html")
+
+
+async def send_activation_email_to_user(request: Request, user: User, db: AsyncSession) -> None:
+    await queue_activation_email(request, user, db)
+    await db.commit()
+    notify_outbox()
+
+
+async def register_user(request: Request, data: schemas.RegistrationSchemaUser,
+                        db: AsyncSession) -> User:
+    """Save user with details and activation email in one transaction"""
+    new_user: User = await save_user(data, db)
+    await save_user_details(new_user.user_id, db)
+    await queue_activation_email(request, new_user, db)
+    await db.commit()
+    notify_outbox()
+    return new_user
 
 
-async def activate_user(user: User, db: Session) -> None:
+async def activate_user(user: User, db: AsyncSession) -> None:
     user.is_active = True
-    db.commit()
+    await db.commit()
+    invalidate_principal(user.user_id)
     return
 
 
-async def get_user_from_token(token: str, db: Session) -> User:
-    sub_base64 = await get_base64_subject_from_token(token)
-    user_id: int = await get_decoded_sub_from_base64(sub_base64)
-    if not user_id:
-        raise UnauthorizedException()
-    user: User = db.query(User).get(user_id)
+async def get_user_from_token(token: str, db: AsyncSession, options: tuple = ()) -> User:
+    user_id: int = await get_user_id_from_token(token)
+    user: User = await db.get(User, user_id, options=options)
     if user is None:
         raise UserDoesNotExistException()
     return user
 
 
-async def get_user_from_request(request: Request, db: Session) -> User | None:
-    user: User = await get_user_from_token(request.cookies.get(AUTH_TOKEN), db)
+async def get_user_from_request(request: Request, db: AsyncSession) -> User | None:
+    # Users from requests are changed and returned as profiles, so details are loaded with them
+    user: User = await get_user_from_token(request.cookies.get(AUTH_TOKEN), db,
+                                           options=user_profile_options)
     return user
 
 
-async def user_if_profile_is_active(request: Request, db: Session = DBDependency) -> User:
+async def user_if_profile_is_active(request: Request, db: AsyncSession = DBDependency) -> User:
     user: User = await get_user_from_request(request, db)
     if not user.is_active:
         raise UnauthorizedException()
     return user
 
 
-async def save_user(data: schemas.RegistrationSchemaUser, db: Session) -> User:
+async def get_principal_from_request(request: Request, db: AsyncSession) -> UserReadSchema:
+    """Get profile of the user authenticated by the request, from principal cache when possible"""
+    user_id: int = await get_user_id_from_token(request.cookies.get(AUTH_TOKEN))
+    principal: UserReadSchema | None = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    generation: int = principal_cache.generation
+    user: User = await db.get(User, user_id, options=user_profile_options)
+    if user is None:
+        raise UserDoesNotExistException()
+    principal = UserReadSchema.model_validate(user)
+    principal_cache.set(user_id, principal, generation=generation)
+    return principal
+
+
+async def principal_if_profile_is_active(request: Request,
+                                         db: AsyncSession = DBDependency) -> UserReadSchema:
+    """Like user_if_profile_is_active, for endpoints which only read the user
+
+    Returned profile is not attached to the session, so it can't be used to change the user.
+    """
+    principal: UserReadSchema = await get_principal_from_request(request, db)
+    if not principal.is_active:
+        raise UnauthorizedException()
+    return principal
+
+
+async def save_user(data: schemas.RegistrationSchemaUser, db: AsyncSession) -> User:
     new_user = User()
     new_user.email = data.email
     new_user.first_name = data.first_name
@@ -69,14 +140,19 @@ async def save_user(data: schemas.RegistrationSchemaUser, db: Session) -> User:
     hashed_password = await get_password_hash(data.password)
     new_user.password = hashed_password
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.flush()
     return new_user
 
 
-async def save_user_details(user_id: int, db: Session) -> UserDetail:
+async def update_password_hash(user: User, hashed_password: str, db: AsyncSession) -> None:
+    user.password = hashed_password
+    await db.commit()
+    return None
+
+
+async def save_user_details(user_id: int, db: AsyncSession) -> UserDetail:
     # TODO: refactor this function to use schema as data
     user_detail = UserDetail(user_id=user_id)
     db.add(user_detail)
-    db.commit()
+    await db.flush()
     return user_detail
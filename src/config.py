@@ -13,6 +13,15 @@ DB_HOST = os.getenv('DB_HOST')
 DB_PORT = os.getenv('DB_PORT')
 DB_NAME = os.getenv('DB_NAME')
 ENVIRONMENT = os.getenv('ENVIRONMENT')
+# bcrypt cost, run `poetry run calibrate-bcrypt` to find one that suits the machine
+BCRYPT_ROUNDS = os.getenv('BCRYPT_ROUNDS', '12')
+# Share login rate limits between workers through Redis, needs `redis` extra when set
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL')
+# Internal location of media root in the front proxy, when set the proxy sends media files
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX')
+# Comma separated addresses of front proxies trusted to set X-Forwarded-For, uvicorn takes the
+# client address from it only for these, so per client limits see the real client
+FORWARDED_ALLOW_IPS = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
 
 SHOW_DOCS_ENVIRONMENT = ('dev',)
 
@@ -27,3 +36,5 @@ MAIL_SSL_TLS = os.getenv('MAIL_SSL_TLS')
 USE_CREDENTIALS = os.getenv('USE_CREDENTIALS')
 VALIDATE_CERTS = os.getenv('VALIDATE_CERTS')
 SUPPRESS_SEND = os.getenv('SUPPRESS_SEND')
+# Address of the frontend, used for links in emails which are not sent from a request
+SITE_URL = os.getenv('SITE_URL', '')
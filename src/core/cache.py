@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+
+class TTLCache:
+    """Process local LRU cache where every entry also expires after `ttl` seconds
+
+    Every worker process keeps its own copy, so `ttl` bounds how long other workers can serve a
+    value that was invalidated elsewhere. Entries can be tagged with what they were built from
+    and invalidated by those tags.
+
+    With `maxbytes`, len() of values must be their size in bytes, and least recently used entries
+    are evicted once their total size exceeds it. Meant for values whose size varies too much to
+    bound by count.
+    """
+
+    def __init__(self, maxsize: int | None, ttl: float, maxbytes: int | None = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # Bumped by every invalidation, see `set`
+        self.generation = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._entry_tags: dict[Hashable, tuple[Hashable, ...]] = {}
+        self._tagged: dict[Hashable, set[Hashable]] = {}
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (),
+            generation: int | None = None) -> None:
+        """Store value under key
+
+        When `generation` read before building the value is given and something was invalidated
+        since, the value may already be stale, so it is not stored.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        if key in self._data:
+            self._drop(key)
+        if self.maxbytes is not None and len(value) > self.maxbytes:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        if self.maxbytes is not None:
+            self.bytes += len(value)
+        tags = tuple(tags)
+        if tags:
+            self._entry_tags[key] = tags
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+        while (self.maxsize is not None and len(self._data) > self.maxsize) or \
+                (self.maxbytes is not None and self.bytes > self.maxbytes):
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self.generation += 1
+        if key in self._data:
+            self._drop(key)
+
+    def invalidate(self, prefix: str | None = None) -> None:
+        """Drop every entry, or only entries whose string key starts with `prefix`"""
+        self.generation += 1
+        if prefix is None:
+            self._data.clear()
+            self._entry_tags.clear()
+            self._tagged.clear()
+            self.bytes = 0
+            return
+        for key in [key for key in self._data if str(key).startswith(prefix)]:
+            self._drop(key)
+
+    def invalidate_tags(self, *tags: Hashable) -> None:
+        """Drop every entry tagged with any of `tags`"""
+        self.generation += 1
+        for tag in tags:
+            for key in list(self._tagged.get(tag, ())):
+                self._drop(key)
+
+    def stats(self) -> dict[str, int | float]:
+        lookups: int = self.hits + self.misses
+        return {"size": len(self._data), "bytes": self.bytes, "hits": self.hits,
+                "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions}
+
+    def _drop(self, key: Hashable) -> None:
+        _, value = self._data.pop(key)
+        if self.maxbytes is not None:
+            self.bytes -= len(value)
+        for tag in self._entry_tags.pop(key, ()):
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+    def __len__(self) -> int:
+        return len(self._data)
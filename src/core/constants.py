@@ -2,7 +2,21 @@ import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploaded files, stored under their content hash
+MEDIA_OBJECTS_ROOT = os.path.join(MEDIA_ROOT, 'objects')
+# Uploads being received, on the same filesystem as objects so they can be moved atomically
+MEDIA_TMP_ROOT = os.path.join(MEDIA_ROOT, '.tmp')
+# Progress of bulk mail jobs, so they can be resumed
+MAIL_CHECKPOINT_ROOT = os.path.join(BASE_DIR, 'checkpoints')
 
 # Email constants
 ACTIVATE_ACCOUNT_SUBJECT = 'Activate your account'
+GUIDES_DIGEST_SUBJECT = 'New guides on Guidio'
 
+# Count cache keys
+GUIDES_COUNT_KEY = 'guides'
+INSTRUCTORS_COUNT_KEY = 'instructors'
+
+# Guides list cache tags
+GUIDE_TAG = 'guide'
+USER_TAG = 'user'
@@ -1,21 +1,23 @@
+from typing import AsyncIterator
+
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import SessionLocal
 
 
 class DBSession:
-    def __enter__(self):
+    async def __aenter__(self):
         self.db = SessionLocal()
         return self.db
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.db.close()
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.db.close()
 
 
-def get_db() -> Session:
-    with DBSession() as db:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with DBSession() as db:
         yield db
 
 
-DBDependency: Session = Depends(get_db)
+DBDependency: AsyncSession = Depends(get_db)
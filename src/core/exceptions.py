@@ -2,12 +2,36 @@ from fastapi import status
 
 
 class BaseCustomException(Exception):
-    def __init__(self, message: str, status_code: int):
+    def __init__(self, message: str, status_code: int, headers: dict[str, str] | None = None):
         self.message = message
         self.status_code = status_code
+        self.headers = headers
         super().__init__(self.message)
 
 
 class ImageNotFoundException(BaseCustomException):
     def __init__(self, message="Image not found"):
         super().__init__(message, status_code=status.HTTP_404_NOT_FOUND)
+
+
+class ServiceBusyException(BaseCustomException):
+    def __init__(self, message="Service is busy, try again later", retry_after: int = 1):
+        super().__init__(message, status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         headers={"Retry-After": str(retry_after)})
+
+
+class TooManyRequestsException(BaseCustomException):
+    def __init__(self, message="Too many requests, try again later", retry_after: int = 1):
+        super().__init__(message, status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                         headers={"Retry-After": str(retry_after)})
+
+
+class FileTooLargeException(BaseCustomException):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File is larger than {max_bytes // (1024 * 1024)} MB",
+                         status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
+class InvalidImageException(BaseCustomException):
+    def __init__(self, message="File is not a valid image"):
+        super().__init__(message, status_code=status.HTTP_400_BAD_REQUEST)
@@ -11,7 +11,8 @@ class ExceptionHandlingMiddleware(BaseHTTPMiddleware):
             response = await call_next(request)
             return response
         except BaseCustomException as e:
-            return JSONResponse(status_code=e.status_code, content={"detail": e.message})
+            return JSONResponse(status_code=e.status_code, content={"detail": e.message},
+                                headers=e.headers)
         except HTTPException as e:
             return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
         except Exception as e:
@@ -1,10 +1,14 @@
 from datetime import datetime
 from typing import Any, Dict
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, func, Text, ForeignKey, \
+    Computed, Index, text, literal_column, JSON
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship, deferred
 
 from core.constants import ACTIVATE_ACCOUNT_SUBJECT
+from guides.constants import GUIDES_SEARCH_CONFIG
 from src.database import Base
 from utils.mail.send_mail import send_mail
 
@@ -12,6 +16,10 @@ from utils.mail.send_mail import send_mail
 # CODEBOOKS
 class Profession(Base):
     __tablename__ = "profession"
+    __table_args__ = (
+        Index('ix_profession_name_trgm', 'name', postgresql_using='gin',
+              postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     profession_id = Column(Integer, primary_key=True)
     name = Column(String(100), unique=True, nullable=False)
@@ -22,6 +30,11 @@ class Profession(Base):
 # USERS
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        # Must match the full_name expression, so the planner can use it for searches
+        Index('ix_user_full_name_trgm', text("(first_name || ' ' || last_name) gin_trgm_ops"),
+              postgresql_using='gin'),
+    )
 
     user_id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(100), nullable=False)
@@ -42,8 +55,17 @@ class User(Base):
                           passive_deletes=True)
 
     def __str__(self):
+        return self.full_name
+
+    @hybrid_property
+    def full_name(self) -> str:
         return f'{self.first_name} {self.last_name}'
 
+    @full_name.expression
+    def full_name(cls):
+        # Separator is inlined, a bound parameter would not match the indexed expression
+        return cls.first_name + literal_column("' '") + cls.last_name
+
     async def email_user(self, subject: str, body: Dict[str, Any], template_name: str):
         """Send email to this user."""
         await send_mail(subject=subject, recipients=[self.email], body=body,
@@ -52,6 +74,10 @@ class User(Base):
 
 class UserDetail(Base):
     __tablename__ = "user_detail"
+    __table_args__ = (
+        Index('ix_user_detail_instructor_user_id', 'user_id',
+              postgresql_where=text('is_instructor')),
+    )
 
     def __init__(self, user_id: int, profession_id=None, bio="", linkedin="", github="", website="",
                  is_instructor=False, avatar=None, cover_image=None, *args: Any, **kwargs: Any):
@@ -75,7 +101,10 @@ class UserDetail(Base):
     website = Column(String(255))
     is_instructor = Column(Boolean, default=False, nullable=False)
     avatar = Column(String(255), nullable=True)
+    # Paths of resized copies, see utils.images
+    avatar_variants = Column(JSON, nullable=True)
     cover_image = Column(String(255), nullable=True)
+    cover_image_variants = Column(JSON, nullable=True)
 
     user_id = Column(Integer, ForeignKey('user.user_id', ondelete="CASCADE"), unique=True)
     user = relationship("User", back_populates="user_details")
@@ -85,6 +114,12 @@ class UserDetail(Base):
 # GUIDES
 class Guide(Base):
     __tablename__ = "guide"
+    __table_args__ = (
+        Index('ix_guide_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_guide_published_last_modified', 'last_modified', 'guide_id',
+              postgresql_where=text('published')),
+        Index('ix_guide_user_id_last_modified_guide_id', 'user_id', 'last_modified', 'guide_id'),
+    )
 
     guide_id = Column(Integer, primary_key=True, index=True)
     title = Column(String(70), nullable=False)
@@ -95,6 +130,13 @@ class Guide(Base):
     published = Column(Boolean, default=False, nullable=False)
     note = Column(String(255), nullable=True)
     cover_image = Column(String(255), nullable=True)
+    cover_image_variants = Column(JSON, nullable=True)
+    # Maintained by the database, weighted so matches in title rank above note and content
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{GUIDES_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{GUIDES_SEARCH_CONFIG}', coalesce(note, '')), 'B') || "
+        f"setweight(to_tsvector('{GUIDES_SEARCH_CONFIG}', coalesce(content, '')), 'C')",
+        persisted=True)))
 
     user_id = Column(Integer, ForeignKey("user.user_id", ondelete="CASCADE"))
 
@@ -102,3 +144,40 @@ class Guide(Base):
 
     def __str__(self):
         return self.title
+
+
+# MEDIA
+class MediaObject(Base):
+    """Uploaded file stored once under hash of its content, shared by everything referring to it"""
+    __tablename__ = "media_object"
+
+    digest = Column(String(64), primary_key=True)
+    path = Column(String(255), nullable=False, unique=True)
+    size = Column(Integer, nullable=False)
+    variants = Column(JSON, nullable=True)
+    # Number of columns pointing to path, files are removed when it drops to zero
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# MAIL
+class EmailOutbox(Base):
+    """Email waiting to be sent by delivery workers, saved in the transaction that caused it"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index('ix_email_outbox_pending', 'next_attempt_at',
+              postgresql_where=text('sent_at IS NULL AND failed_at IS NULL')),
+    )
+
+    email_outbox_id = Column(Integer, primary_key=True)
+    subject = Column(String(255), nullable=False)
+    recipients = Column(JSON, nullable=False)
+    body = Column(JSON, nullable=False)
+    template_name = Column(String(255), nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    # Set when all attempts failed
+    failed_at = Column(DateTime(timezone=True), nullable=True)
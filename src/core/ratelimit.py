@@ -0,0 +1,106 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from core.exceptions import TooManyRequestsException
+
+# Refills the bucket for the time passed since last request, then takes one token if available.
+# Returns seconds until a token is available, 0 when one was taken.
+REDIS_TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / refill_rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill_rate * 1000))
+return tostring(retry_after)
+"""
+
+
+class InMemoryTokenBuckets:
+    """Token buckets of this process, at most `maxsize` of them
+
+    Least recently used buckets are dropped first, dropped bucket starts again full.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: float, refill_rate: float) -> float:
+        """Take a token from the bucket, return seconds until one is available if it's empty"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / refill_rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisTokenBuckets:
+    """Token buckets shared by every worker, kept in Redis with expiry once they would be full
+
+    When Redis can't be reached, buckets of this process are used instead.
+    """
+
+    def __init__(self, url: str, maxsize: int):
+        # Optional dependency, only needed when limits are shared between workers
+        from redis import asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.take_token = self.client.register_script(REDIS_TAKE_TOKEN_SCRIPT)
+        self.fallback = InMemoryTokenBuckets(maxsize)
+
+    async def take(self, key: str, capacity: float, refill_rate: float) -> float:
+        try:
+            retry_after = await self.take_token(keys=[key],
+                                                args=[capacity, refill_rate, time.time()])
+            return float(retry_after)
+        except Exception as e:
+            logging.error(f"Shared rate limit backend failed: {str(e)}")
+            return await self.fallback.take(key, capacity, refill_rate)
+
+
+class RateLimiter:
+    """Allows `capacity` requests per key at once, refilled by `refill_rate` requests per second"""
+
+    def __init__(self, name: str, capacity: float, refill_rate: float,
+                 buckets: InMemoryTokenBuckets | RedisTokenBuckets):
+        self.name = name
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.buckets = buckets
+        self.rejected = 0
+
+    async def check(self, key: str) -> None:
+        """Take a token for the key
+
+        Raises:
+            TooManyRequestsException: when key has no tokens left, with time until it gets one
+        """
+        retry_after = await self.buckets.take(f"{self.name}:{key}", self.capacity,
+                                              self.refill_rate)
+        if retry_after > 0:
+            self.rejected += 1
+            logging.warning(f"Rate limit {self.name} exceeded, rejected {self.rejected} so far")
+            raise TooManyRequestsException(retry_after=math.ceil(retry_after))
+
+    def stats(self) -> dict[str, int]:
+        return {"rejected": self.rejected}
@@ -11,6 +11,18 @@ class BaseModelSchema(PydanticBaseModel):
         populate_by_name = True
 
 
+class ImageVariantSchema(BaseModelSchema):
+    webp: str
+    # JPEG, or PNG for images with transparency
+    fallback: str
+
+
+class ImageVariantsSchema(BaseModelSchema):
+    thumb: ImageVariantSchema
+    medium: ImageVariantSchema
+    large: ImageVariantSchema
+
+
 class UserPasswordSchema(BaseModelSchema):
     password: str = Field(min_length=8)
 
@@ -1,6 +1,42 @@
+import json
 import os
 
-from core.constants import MEDIA_ROOT
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from core.cache import TTLCache
+from core.constants import MEDIA_ROOT, GUIDES_COUNT_KEY, INSTRUCTORS_COUNT_KEY, GUIDE_TAG, \
+    USER_TAG
+from core.settings import COUNT_CACHE_MAX_ENTRIES, COUNT_CACHE_TTL_SECONDS, \
+    ESTIMATED_COUNT_THRESHOLD, GUIDES_LIST_CACHE_MAX_ENTRIES, GUIDES_LIST_CACHE_TTL_SECONDS, \
+    GUIDE_DETAIL_CACHE_MAX_BYTES, GUIDE_DETAIL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES, \
+    PRINCIPAL_CACHE_TTL_SECONDS
+
+count_cache = TTLCache(maxsize=COUNT_CACHE_MAX_ENTRIES, ttl=COUNT_CACHE_TTL_SECONDS)
+# Serialized pages of public guide lists, tagged with guides and authors shown on them
+guides_list_cache = TTLCache(maxsize=GUIDES_LIST_CACHE_MAX_ENTRIES,
+                             ttl=GUIDES_LIST_CACHE_TTL_SECONDS)
+# Serialized guide details, bounded by bytes since guide content has no size limit
+guide_detail_cache = TTLCache(maxsize=None, ttl=GUIDE_DETAIL_CACHE_TTL_SECONDS,
+                              maxbytes=GUIDE_DETAIL_CACHE_MAX_BYTES)
+# Profiles of authenticated users by user id, so authenticating a request needs no query
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a query, executed like any other statement"""
+    inherit_cache = False
+
+    def __init__(self, query: Select):
+        self.query = query
+
+
+@compiles(Explain, 'postgresql')
+def compile_explain(element: Explain, compiler, **kwargs) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.query, **kwargs)}"
 
 
 def create_media_root():
@@ -12,3 +48,69 @@ async def count_number_of_pages(num_of_objects: int, page_size: int):
     division: tuple[int, int] = divmod(num_of_objects, page_size)
     pages: int = division[0] + 1 if division[1] else division[0]
     return pages
+
+
+async def get_estimated_number_of_rows(db: AsyncSession, query: Select) -> int:
+    """Get number of rows the query planner expects the query to return, without running it"""
+    plan = (await db.execute(Explain(query.order_by(None)))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def get_number_of_rows(db: AsyncSession, query: Select, cache_key: str,
+                             allow_estimate: bool = False) -> int:
+    """Count rows returned by the query, reusing cached count for the same cache key
+
+    Args:
+        db (AsyncSession): database session
+        query (Select): query to count rows of
+        cache_key (str): key identifying the query filters, prefixed with one of count keys
+        allow_estimate (bool): use planner estimate when it is above ESTIMATED_COUNT_THRESHOLD,
+            meant for large lists without filters where exact count is a full scan
+
+    Returns:
+        exact or estimated number of rows
+    """
+    number_of_rows: int | None = count_cache.get(cache_key)
+    if number_of_rows is not None:
+        return number_of_rows
+    generation: int = count_cache.generation
+    if allow_estimate:
+        number_of_rows = await get_estimated_number_of_rows(db, query)
+    if number_of_rows is None or number_of_rows < ESTIMATED_COUNT_THRESHOLD:
+        number_of_rows = await db.scalar(
+            select(func.count()).select_from(query.order_by(None).subquery()))
+    count_cache.set(cache_key, number_of_rows, generation=generation)
+    return number_of_rows
+
+
+def invalidate_guides_count() -> None:
+    count_cache.invalidate(GUIDES_COUNT_KEY)
+
+
+def invalidate_instructors_count() -> None:
+    count_cache.invalidate(INSTRUCTORS_COUNT_KEY)
+
+
+def invalidate_guides_responses(guide_id: int | None = None, user_id: int | None = None,
+                                all_lists: bool = False) -> None:
+    """Drop cached guide lists and details showing the guide or the author
+
+    Pass `all_lists` when guides are added, removed, published or unpublished, since that shifts
+    every page.
+    """
+    tags = []
+    if guide_id is not None:
+        tags.append((GUIDE_TAG, guide_id))
+    if user_id is not None:
+        tags.append((USER_TAG, user_id))
+    guide_detail_cache.invalidate_tags(*tags)
+    if all_lists:
+        guides_list_cache.invalidate()
+    else:
+        guides_list_cache.invalidate_tags(*tags)
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.delete(user_id)
@@ -3,5 +3,103 @@
 AUTH_TOKEN = "auth_token"
 
 
+# PASSWORD HASHING
+PASSWORD_HASHING_WORKERS = 4
+# Hashing requests allowed to wait for a worker, above this they are rejected with 503
+PASSWORD_HASHING_QUEUE_LIMIT = 32
+PASSWORD_HASHING_RETRY_AFTER_SECONDS = 1
+
+
+# UPLOADS
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_WORKERS = 4
+# Uploads allowed to wait for a worker, above this they are rejected with 503
+UPLOAD_QUEUE_LIMIT = 16
+
+
+
+# IMAGES
+IMAGE_WORKERS = 2
+# Images allowed to wait for a worker, above this uploads are rejected with 503
+IMAGE_QUEUE_LIMIT = 8
+# Longest side of every variant in pixels, images are never upscaled
+IMAGE_VARIANT_SIZES = {"thumb": 128, "medium": 640, "large": 1280}
+IMAGE_VARIANT_QUALITY = 80
+# Extensions uploaded images are stored with, by format detected in them; other formats get their
+# lowercased name
+IMAGE_FORMAT_EXTENSIONS = {"JPEG": ".jpg", "MPO": ".jpg", "PNG": ".png", "GIF": ".gif",
+                           "WEBP": ".webp", "TIFF": ".tif"}
+
+
+
+# MEDIA
+# Stored objects never change, a different content gets a different path
+MEDIA_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Files stored before content addressing
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+# Read at a time when the server can't send files by itself
+MEDIA_CHUNK_BYTES = 256 * 1024
+
+
+# LOGIN RATE LIMITS
+# Burst of attempts allowed, and attempts per second regained after it
+LOGIN_IP_RATE_LIMIT_CAPACITY = 20
+LOGIN_IP_RATE_LIMIT_REFILL_RATE = 20 / 60
+LOGIN_EMAIL_RATE_LIMIT_CAPACITY = 5
+LOGIN_EMAIL_RATE_LIMIT_REFILL_RATE = 5 / 60
+# Rate limit buckets kept per worker process
+RATE_LIMIT_MAX_KEYS = 100000
+
+
+# VERIFIED TOKENS
+VERIFIED_TOKEN_CACHE_MAX_ENTRIES = 10000
+VERIFIED_TOKEN_CACHE_TTL_SECONDS = 300
+
+
+# PRINCIPALS
+PRINCIPAL_CACHE_MAX_ENTRIES = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 30
+
+
 # MAIL
 DEFAULT_FROM_EMAIL = "webmaster@localhost.com"
+MAIL_OUTBOX_WORKERS = 2
+MAIL_OUTBOX_BATCH_SIZE = 20
+# Workers also check the outbox this often, for mail queued by other processes
+MAIL_OUTBOX_POLL_SECONDS = 5
+MAIL_OUTBOX_MAX_ATTEMPTS = 8
+# Delay before retry doubles with every failed attempt, up to the max
+MAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+MAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+# Claimed emails are taken again by another worker when not sent within the lease, it must be
+# longer than sending a whole batch takes
+MAIL_OUTBOX_LEASE_SECONDS = 300
+MAIL_SMTP_POOL_SIZE = 2
+# Bulk mail jobs, like guides digest
+MAIL_BULK_SMTP_POOL_SIZE = 4
+MAIL_BULK_RATE_PER_SECOND = 10
+MAIL_BULK_BATCH_SIZE = 500
+MAIL_DIGEST_DAYS = 7
+MAIL_DIGEST_MAX_GUIDES = 10
+
+
+# COUNTS
+COUNT_CACHE_MAX_ENTRIES = 1024
+COUNT_CACHE_TTL_SECONDS = 60
+# Lists estimated by the planner above this many rows report the estimate instead of exact count
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+# GUIDES LISTS
+GUIDES_LIST_CACHE_MAX_ENTRIES = 256
+GUIDES_LIST_CACHE_TTL_SECONDS = 30
+
+
+# GUIDE DETAIL
+GUIDE_DETAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+GUIDE_DETAIL_CACHE_TTL_SECONDS = 300
+
+
+# PROFESSIONS
+PROFESSION_INDEX_REFRESH_SECONDS = 300
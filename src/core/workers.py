@@ -0,0 +1,30 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable
+
+from core.exceptions import ServiceBusyException
+
+
+class BoundedPool:
+    """Runs blocking calls in an executor, rejecting them when too many already wait for a worker
+
+    Rejecting early keeps waiting time bounded, instead of letting the queue grow under load.
+    """
+
+    def __init__(self, executor: Executor, workers: int, queue_limit: int,
+                 retry_after: int = 1):
+        self.executor = executor
+        self.max_pending = workers + queue_limit
+        self.retry_after = retry_after
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceBusyException(retry_after=self.retry_after)
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
@@ -4,3 +4,12 @@ from enum import Enum
 class RetrieveOrder(str, Enum):
     ascending = "asc"
     descending = "desc"
+
+
+# Full text search
+# Snippets are HTML, guide content is escaped before <mark> tags are added around matches
+GUIDES_SEARCH_CONFIG = 'english'
+GUIDES_SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, ' \
+                                 'MaxFragments=2'
+# Ampersand goes first, so entities of the other characters aren't escaped again
+HTML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;'))
@@ -18,3 +18,8 @@ class NotInstructorException(BaseCustomException):
 
     def __init__(self, message="You are not an instructor"):
         super().__init__(message, status_code=status.HTTP_403_FORBIDDEN)
+
+
+class InvalidCursorException(BaseCustomException):
+    def __init__(self, message="Invalid cursor"):
+        super().__init__(message, status_code=status.HTTP_400_BAD_REQUEST)
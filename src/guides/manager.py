@@ -1,50 +1,56 @@
-from fastapi import UploadFile
-from sqlalchemy.orm import Session
+from fastapi import UploadFile, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth.exceptions import InvalidCredentialsException, UnauthorizedException
 from core.exceptions import ImageNotFoundException
-from core.models import User, Guide
+from core.models import Guide
 from guides import service, schemas
 from guides.exceptions import GuidesNotFoundException, NotInstructorException, \
     GuideNotFoundException
-
-
-async def get_list_of_guides(db: Session, page: int, page_size: int,
-                             order: str) -> schemas.GuideListReadSchema:
-    guides = await service.get_list_of_guides(db,
-                                              page=page - 1,
-                                              page_size=page_size,
-                                              sort_order=order,
-                                              published_only=True)
-    if not guides.guides:
+from users.schemas import UserReadSchema
+from utils.http import conditional_response, is_conditional, is_not_modified, \
+    not_modified_response
+
+
+async def get_list_of_guides(request: Request, db: AsyncSession, page: int, page_size: int,
+                             order: str, after: str | None = None,
+                             include_total: bool = True) -> Response:
+    guides = await service.get_serialized_list_of_guides(db,
+                                                         page=page - 1,
+                                                         page_size=page_size,
+                                                         sort_order=order,
+                                                         after=after,
+                                                         include_total=include_total)
+    if guides is None:
         raise GuidesNotFoundException()
-    return schemas.GuideListReadSchema(pages=guides.pages, guides=guides.guides)
+    return conditional_response(request, guides)
 
 
-async def create_guide(db: Session, user: User, data: schemas.GuideCreateUpdateSchema) -> Guide:
+async def create_guide(db: AsyncSession, user: UserReadSchema,
+                       data: schemas.GuideCreateUpdateSchema) -> schemas.GuideReadSchema:
     if not user:
         raise InvalidCredentialsException()
     if not user.user_details.is_instructor:
         raise NotInstructorException()
     guide = await service.save_guide(db, data, user_id=user.user_id)
-    return guide
+    return await service.get_guide_detail(db, guide.guide_id)
 
 
-async def get_guide_featured_image(db: Session, guide_id: int,
-                                   user: User) -> schemas.GuideCoverImageSchema:
-    guide: Guide = await service.get_guide_by_id(db, guide_id)
+async def get_guide_featured_image(db: AsyncSession, guide_id: int,
+                                   user: UserReadSchema) -> schemas.GuideCoverImageSchema:
+    guide: Guide = await service.get_guide_header(db, guide_id)
     if not guide:
         raise GuideNotFoundException()
     elif not guide.user_id == user.user_id and not guide.published:
         raise UnauthorizedException()
     elif guide.cover_image is None:
         raise ImageNotFoundException()
-    return schemas.GuideCoverImageSchema(cover_image=guide.cover_image)
+    return schemas.GuideCoverImageSchema.model_validate(guide)
 
 
-async def save_guide_featured_image(db: Session, guide_id: int, user: User,
+async def save_guide_featured_image(db: AsyncSession, guide_id: int, user: UserReadSchema,
                                     file: UploadFile) -> schemas.GuideCoverImageSchema:
-    guide: Guide = await service.get_guide_by_id(db, guide_id)
+    guide: Guide = await service.get_guide_header(db, guide_id)
     if not guide:
         raise GuideNotFoundException()
     elif not guide.user_id == user.user_id:
@@ -53,8 +59,8 @@ async def save_guide_featured_image(db: Session, guide_id: int, user: User,
     return saved
 
 
-async def delete_guide_featured_image(guide_id: int, db: Session, user: User) -> None:
-    guide = await service.get_guide_by_id(db, guide_id)
+async def delete_guide_featured_image(guide_id: int, db: AsyncSession, user: UserReadSchema) -> None:
+    guide = await service.get_guide_header(db, guide_id)
     if not guide:
         raise GuideNotFoundException()
     elif not guide.user_id == user.user_id:
@@ -65,47 +71,61 @@ async def delete_guide_featured_image(guide_id: int, db: Session, user: User) ->
     return None
 
 
-async def get_guides_by_title(title: str, page: int, page_size: int,
-                              db: Session) -> schemas.GuideListReadSchema:
-    guides = await service.search_guides(db, title, page=page - 1, page_size=page_size)
-    if not guides.guides:
+async def get_guides_by_title(request: Request, title: str, page: int, page_size: int,
+                              db: AsyncSession,
+                              after: str | None = None,
+                              include_total: bool = True) -> Response:
+    guides = await service.search_guides(db, title, page=page - 1, page_size=page_size,
+                                         after=after, include_total=include_total)
+    if guides is None:
         raise GuidesNotFoundException()
-    return guides
-
-
-async def get_guides_by_user_id(user_id: int, page: int, page_size: int, db: Session,
-                                user: User) -> schemas.GuideListReadSchema:
-    guides = await service.get_guides_by_user_id(db=db,
-                                                 user_id=user_id,
-                                                 page=page - 1,
-                                                 page_size=page_size,
-                                                 user=user)
-    if not guides.guides:
+    return conditional_response(request, guides)
+
+
+async def get_guides_by_user_id(request: Request, user_id: int, page: int, page_size: int,
+                                db: AsyncSession, user: UserReadSchema, after: str | None = None,
+                                include_total: bool = True) -> Response:
+    guides = await service.get_serialized_guides_by_user_id(db=db,
+                                                            user_id=user_id,
+                                                            page=page - 1,
+                                                            page_size=page_size,
+                                                            user=user,
+                                                            after=after,
+                                                            include_total=include_total)
+    if guides is None:
         raise GuidesNotFoundException()
-    return schemas.GuideListReadSchema(pages=guides.pages, guides=guides.guides)
-
-
-async def get_guide_by_id(guide_id: int, db: Session) -> schemas.GuideReadSchema:
-    guide = await service.get_guide_by_id(db, guide_id)
-    if not guide:
+    return conditional_response(request, guides)
+
+
+async def get_guide_by_id(request: Request, guide_id: int, db: AsyncSession) -> Response:
+    if is_conditional(request):
+        # Answer revalidation from cheap metadata query, without loading content
+        etag = await service.get_guide_detail_etag_by_id(db, guide_id)
+        if etag is None:
+            raise GuideNotFoundException()
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+    guide = await service.get_serialized_guide_detail(db, guide_id)
+    if guide is None:
         raise GuideNotFoundException()
-    return guide
+    return conditional_response(request, guide)
 
 
-async def update_guide(guide_id: int, data: schemas.GuideCreateUpdateSchema, db: Session,
-                       user: User):
-    guide = await service.get_guide_by_id(db, guide_id)
+async def update_guide(guide_id: int, data: schemas.GuideCreateUpdateSchema, db: AsyncSession,
+                       user: UserReadSchema):
+    guide = await service.get_guide_header(db, guide_id)
     if not guide:
         raise GuideNotFoundException()
     elif not guide.user_id == user.user_id:
         raise UnauthorizedException()
     elif not user.user_details.is_instructor:
         raise NotInstructorException()
-    return await service.save_guide(db, data, user_id=user.user_id, guide=guide)
+    await service.save_guide(db, data, user_id=user.user_id, guide=guide)
+    return await service.get_guide_detail(db, guide_id)
 
 
-async def delete_guide(guide_id: int, db: Session, user: User):
-    guide = await service.get_guide_by_id(db, guide_id)
+async def delete_guide(guide_id: int, db: AsyncSession, user: UserReadSchema):
+    guide = await service.get_guide_header(db, guide_id)
     if not guide:
         raise GuideNotFoundException()
     elif not guide.user_id == user.user_id:
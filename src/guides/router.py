@@ -1,11 +1,11 @@
-from fastapi import APIRouter, status, Query, Depends, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, status, Query, Depends, UploadFile, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.service import user_if_profile_is_active
+from auth.service import principal_if_profile_is_active
 from core.dependencies import DBDependency
-from core.models import User, Guide
 from guides import schemas, manager
 from guides.constants import RetrieveOrder
+from users.schemas import UserReadSchema
 
 router = APIRouter()
 
@@ -14,16 +14,24 @@ router = APIRouter()
             description="Get list of guides",
             status_code=status.HTTP_200_OK,
             response_model=schemas.GuideListReadSchema)
-async def get_guides(db: Session = DBDependency,
+async def get_guides(request: Request,
+                     db: AsyncSession = DBDependency,
                      order: RetrieveOrder = Query(default=RetrieveOrder.descending,
                                                   description="Retrieve order: asc/desc"),
                      page: int = Query(default=1, ge=1, description="Page to request"),
                      page_size: int = Query(default=50, ge=1, le=100,
-                                            description="Page size")):
-    return await manager.get_list_of_guides(db,
+                                            description="Page size"),
+                     after: str | None = Query(default=None,
+                                               description="Cursor returned as nextCursor, "
+                                                           "overrides page"),
+                     include_total: bool = Query(default=True,
+                                                 description="Count total number of pages")):
+    return await manager.get_list_of_guides(request, db,
                                             page=page,
                                             page_size=page_size,
-                                            order=order)
+                                            order=order,
+                                            after=after,
+                                            include_total=include_total)
 
 
 @router.post(path="",
@@ -31,10 +39,9 @@ async def get_guides(db: Session = DBDependency,
              status_code=status.HTTP_201_CREATED,
              response_model=schemas.GuideReadSchema)
 async def create_guide(data: schemas.GuideCreateUpdateSchema,
-                       db: Session = DBDependency,
-                       user: User = Depends(user_if_profile_is_active)) -> Guide:
-    guide: Guide = await manager.create_guide(db, user, data)
-    return guide
+                       db: AsyncSession = DBDependency,
+                       user: UserReadSchema = Depends(principal_if_profile_is_active)):
+    return await manager.create_guide(db, user, data)
 
 
 @router.get(path="/cover_image",
@@ -43,8 +50,8 @@ async def create_guide(data: schemas.GuideCreateUpdateSchema,
             status_code=status.HTTP_200_OK)
 async def get_featured_image(
         guide_id: int,
-        db: Session = DBDependency,
-        user: User = Depends(user_if_profile_is_active)):
+        db: AsyncSession = DBDependency,
+        user: UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.get_guide_featured_image(db, guide_id, user)
 
 
@@ -54,8 +61,8 @@ async def get_featured_image(
              status_code=status.HTTP_201_CREATED)
 async def save_featured_image(guide_id: int,
                               file: UploadFile,
-                              db: Session = DBDependency,
-                              user: User = Depends(user_if_profile_is_active)):
+                              db: AsyncSession = DBDependency,
+                              user: UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.save_guide_featured_image(db, guide_id, user, file)
 
 
@@ -65,8 +72,8 @@ async def save_featured_image(guide_id: int,
             status_code=status.HTTP_200_OK)
 async def update_featured_image(guide_id: int,
                                 file: UploadFile,
-                                db: Session = DBDependency,
-                                user: User = Depends(user_if_profile_is_active)):
+                                db: AsyncSession = DBDependency,
+                                user: UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.save_guide_featured_image(db, guide_id, user, file)
 
 
@@ -74,43 +81,60 @@ async def update_featured_image(guide_id: int,
                description="Delete guide featured image",
                status_code=status.HTTP_204_NO_CONTENT)
 async def delete_featured_image(guide_id: int,
-                                db: Session = DBDependency,
-                                user: User = Depends(user_if_profile_is_active)) -> None:
+                                db: AsyncSession = DBDependency,
+                                user: UserReadSchema = Depends(principal_if_profile_is_active)) -> None:
     return await manager.delete_guide_featured_image(guide_id, db, user)
 
 
 @router.get(path="/search",
-            description="Search guides by title",
+            description="Search guides by title, note and content, ordered by relevance",
             status_code=status.HTTP_200_OK,
             response_model=schemas.GuideListReadSchema)
-async def get_guides_by_title(title: str,
+async def get_guides_by_title(request: Request,
+                              title: str,
                               page: int = Query(default=1, ge=1, description="Page to request"),
                               page_size: int = Query(default=50, ge=1, le=100,
                                                      description="Page size"),
-                              db: Session = DBDependency):
-    return await manager.get_guides_by_title(title, page, page_size, db)
+                              after: str | None = Query(default=None,
+                                                        description="Cursor returned as "
+                                                                    "nextCursor, overrides page"),
+                              include_total: bool = Query(default=True,
+                                                          description="Count total number of "
+                                                                      "pages"),
+                              db: AsyncSession = DBDependency):
+    return await manager.get_guides_by_title(request, title, page, page_size, db, after,
+                                             include_total)
 
 
 @router.get(path="/{user_id}",
             description="Get guides by user ID",
             status_code=status.HTTP_200_OK,
             response_model=schemas.GuideListReadSchema)
-async def get_guides_by_user_id(user_id: int,
+async def get_guides_by_user_id(request: Request,
+                                user_id: int,
                                 page: int = Query(default=1, ge=1, description="Page to request"),
                                 page_size: int = Query(default=50, ge=1, le=100,
                                                        description="Page size"),
-                                db: Session = DBDependency,
-                                user: User = Depends(user_if_profile_is_active)):
-    return await manager.get_guides_by_user_id(user_id, page, page_size, db, user)
+                                after: str | None = Query(default=None,
+                                                          description="Cursor returned as "
+                                                                      "nextCursor, overrides page"),
+                                include_total: bool = Query(default=True,
+                                                            description="Count total number of "
+                                                                        "pages"),
+                                db: AsyncSession = DBDependency,
+                                user: UserReadSchema = Depends(principal_if_profile_is_active)):
+    return await manager.get_guides_by_user_id(request, user_id, page, page_size, db, user,
+                                               after, include_total)
 
 
 @router.get("/guide/{guide_id}",
             description="Get single guide by ID",
             status_code=status.HTTP_200_OK,
             response_model=schemas.GuideReadSchema)
-async def get_guide_by_id(guide_id: int,
-                          db: Session = DBDependency):
-    return await manager.get_guide_by_id(guide_id, db)
+async def get_guide_by_id(request: Request,
+                          guide_id: int,
+                          db: AsyncSession = DBDependency):
+    return await manager.get_guide_by_id(request, guide_id, db)
 
 
 @router.put(path="/{guide_id}",
@@ -118,8 +142,8 @@ async def get_guide_by_id(guide_id: int,
             status_code=status.HTTP_201_CREATED,
             response_model=schemas.GuideReadSchema)
 async def update_guide(guide_id: int, data: schemas.GuideCreateUpdateSchema,
-                       db: Session = DBDependency,
-                       user: User = Depends(user_if_profile_is_active)):
+                       db: AsyncSession = DBDependency,
+                       user: UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.update_guide(guide_id, data, db, user)
 
 
@@ -127,6 +151,6 @@ async def update_guide(guide_id: int, data: schemas.GuideCreateUpdateSchema,
                description="Delete guide",
                status_code=status.HTTP_204_NO_CONTENT)
 async def delete_guide(guide_id: int,
-                       db: Session = DBDependency,
-                       user: User = Depends(user_if_profile_is_active)):
+                       db: AsyncSession = DBDependency,
+                       user: UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.delete_guide(guide_id, db, user)
@@ -2,12 +2,13 @@ from datetime import datetime
 
 from pydantic import Field, field_validator
 
-from core.schemas import BaseModelSchema
+from core.schemas import BaseModelSchema, ImageVariantsSchema
 from users.schemas import UserReadSchema, UserListReadSchema
 
 
 class GuideCoverImageSchema(BaseModelSchema):
     cover_image: str | None
+    cover_image_variants: ImageVariantsSchema | None = None
 
     class Config:
         from_attributes = True
@@ -20,6 +21,9 @@ class GuideListSingleSchema(BaseModelSchema):
     created_at: datetime
     last_modified: datetime
     cover_image: str | None
+    cover_image_variants: ImageVariantsSchema | None = None
+    # Escaped HTML fragment of content, with search matches wrapped in <mark> tags
+    snippet: str | None = None
     user: UserListReadSchema
 
     class Config:
@@ -27,8 +31,10 @@ class GuideListSingleSchema(BaseModelSchema):
 
 
 class GuideListReadSchema(BaseModelSchema):
-    pages: int
+    pages: int | None
     guides: list[GuideListSingleSchema]
+    next_cursor: str | None = None
+    has_more: bool = False
 
 
 class GuideCreateUpdateSchema(BaseModelSchema):
@@ -63,6 +69,7 @@ class GuideReadSchema(GuideCreateUpdateSchema):
     created_at: datetime
     last_modified: datetime
     cover_image: str | None
+    cover_image_variants: ImageVariantsSchema | None = None
     user: UserReadSchema
 
     class Config:
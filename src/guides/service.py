@@ -1,62 +1,138 @@
-import os
-import shutil
+from datetime import datetime, timezone
 
 from fastapi import UploadFile
-from sqlalchemy import asc, desc, func
-from sqlalchemy.orm import Session, Query
+from sqlalchemy import asc, desc, func, select, tuple_, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, raiseload
+from sqlalchemy.sql import Select
 
-from core.models import Guide, User, Profession, UserDetail
-from core.service import count_number_of_pages
-from guides.constants import RetrieveOrder
-from guides.schemas import GuideCreateUpdateSchema, GuideListSingleSchema, GuideListReadSchema
-from users.schemas import UserListReadSchema
-from utils.guides import get_featured_image_upload_path
+from core.constants import GUIDES_COUNT_KEY, GUIDE_TAG, USER_TAG
+from core.models import Guide, User, Profession, UserDetail, MediaObject
+from core.service import count_number_of_pages, get_number_of_rows, invalidate_guides_count, \
+    guides_list_cache, guide_detail_cache, invalidate_guides_responses
+from guides.constants import RetrieveOrder, GUIDES_SEARCH_CONFIG, GUIDES_SEARCH_HEADLINE_OPTIONS, \
+    HTML_ESCAPES
+from guides.exceptions import InvalidCursorException
+from guides.schemas import GuideCreateUpdateSchema, GuideListSingleSchema, GuideListReadSchema, \
+    GuideReadSchema
+from users.schemas import UserListReadSchema, UserReadSchema, UserDetailSchema, \
+    ProfessionReadSchema
+from utils.guides import encode_guides_cursor, decode_guides_cursor
+from utils.http import SerializedResponse, make_etag
+from utils.media import store_media, release_media, remove_media
 
+# Inlined, because bound parameter would be sent as varchar which has no cast to regconfig
+search_config = literal_column(f"'{GUIDES_SEARCH_CONFIG}'::regconfig")
 
-async def get_initial_list_of_guides(db: Session,
-                                     search: str = '') -> Query | None:
-    guides = db.query(
+
+async def get_guides_search_query(search: str):
+    """Get full text search query for guides from search phrase written by the user"""
+    return func.websearch_to_tsquery(search_config, search)
+
+
+def escape_html(text):
+    """Escape HTML special characters of a text column in the query
+
+    Snippets are highlighted with <mark> tags, so the guide content around them is escaped first
+    and the snippet can be rendered as HTML without running markup written by the author.
+    """
+    for character, entity in HTML_ESCAPES:
+        text = func.replace(text, character, entity)
+    return text
+
+
+async def get_initial_list_of_guides(search: str = '') -> Select:
+    guides = select(
         Guide.guide_id,
         Guide.title,
         Guide.published,
         Guide.created_at,
         Guide.last_modified,
         Guide.cover_image,
+        Guide.cover_image_variants,
         User.first_name,
         User.last_name,
         UserDetail.avatar,
+        UserDetail.avatar_variants,
         User.user_id,
         Profession.name.label('profession')) \
         .filter(Guide.user_id == User.user_id, User.user_id == UserDetail.user_id,
                 UserDetail.profession_id == Profession.profession_id,
-                func.coalesce(Guide.title, '').ilike(f"%{search}%"),
                 )
+    if search:
+        search_query = await get_guides_search_query(search)
+        guides = guides.filter(Guide.search_vector.op('@@')(search_query))
     return guides
 
 
-async def get_list_of_guides(db: Session,
+async def get_list_of_guides(db: AsyncSession,
                              page: int,
                              page_size: int,
                              sort_order: str = RetrieveOrder.descending,
                              search: str = '',
                              published_only: bool = True,
-                             user_id: int = None) -> GuideListReadSchema | None:
-    offset: int = page * page_size
+                             user_id: int = None,
+                             after: str | None = None,
+                             include_total: bool = True) -> GuideListReadSchema | None:
+    """Get page of guides, either by page number or by keyset cursor
 
-    if sort_order == RetrieveOrder.descending:
-        order_by_clause = desc(Guide.last_modified)
-    else:
-        order_by_clause = asc(Guide.last_modified)
+    Guides are ordered by last_modified, or by search rank when `search` is given.
+    When `after` cursor is given, page number is ignored and guides are fetched right after the
+    position encoded in the cursor, without counting total number of pages. Counting is also
+    skipped when `include_total` is False.
+    """
+    offset: int = page * page_size
 
-    query = await get_initial_list_of_guides(db, search=search)
+    guides = await get_initial_list_of_guides(search=search)
     if published_only:
-        guides = query.filter(Guide.published).order_by(order_by_clause)
-    else:
-        guides = query.order_by(order_by_clause)
+        guides = guides.filter(Guide.published)
     if user_id:
         guides = guides.filter(Guide.user_id == user_id)
-    pages: int = await count_number_of_pages(guides.count(), page_size)
-    guides = guides.offset(offset).limit(page_size).all()
+
+    pages: int | None = None
+    if include_total and not after:
+        count_of_guides: int = await get_number_of_rows(
+            db, guides,
+            cache_key=f"{GUIDES_COUNT_KEY}:{published_only}:{user_id}:{search.lower()}",
+            allow_estimate=not search and not user_id)
+        pages = await count_number_of_pages(count_of_guides, page_size)
+
+    if search:
+        search_query = await get_guides_search_query(search)
+        sort_key = func.ts_rank(Guide.search_vector, search_query)
+        cursor_type = float
+        descending = True
+        guides = guides.add_columns(
+            sort_key.label('rank'),
+            func.ts_headline(search_config, escape_html(Guide.content), search_query,
+                             GUIDES_SEARCH_HEADLINE_OPTIONS).label('snippet'))
+    else:
+        sort_key = Guide.last_modified
+        cursor_type = datetime
+        descending = sort_order == RetrieveOrder.descending
+    # guide_id is a tiebreaker, so (sort_key, guide_id) gives stable order for the cursor
+    if descending:
+        guides = guides.order_by(desc(sort_key), desc(Guide.guide_id))
+    else:
+        guides = guides.order_by(asc(sort_key), asc(Guide.guide_id))
+
+    if after:
+        seek_key = decode_guides_cursor(after)
+        if not isinstance(seek_key[0], cursor_type):
+            raise InvalidCursorException()
+        position = tuple_(sort_key, Guide.guide_id)
+        guides = guides.filter(position < seek_key if descending else position > seek_key)
+    else:
+        guides = guides.offset(offset)
+    # Fetch one row more than requested to know if there is a next page
+    guides = (await db.execute(guides.limit(page_size + 1))).all()
+    has_more: bool = len(guides) > page_size
+    guides = guides[:page_size]
+    next_cursor: str | None = None
+    if has_more:
+        last = guides[-1]
+        next_cursor = encode_guides_cursor(last.rank if search else last.last_modified,
+                                           last.guide_id)
     guides_list = [
         GuideListSingleSchema(
             **{
@@ -66,11 +142,14 @@ async def get_list_of_guides(db: Session,
                 "created_at": record.created_at,
                 "last_modified": record.last_modified,
                 "cover_image": record.cover_image,
+                "cover_image_variants": record.cover_image_variants,
+                "snippet": record.snippet if search else None,
                 "user": UserListReadSchema(
                     **{
                         "first_name": record.first_name,
                         "last_name": record.last_name,
                         "avatar": record.avatar,
+                        "avatar_variants": record.avatar_variants,
                         "user_id": record.user_id,
                         "profession": record.profession,
                     }
@@ -79,87 +158,285 @@ async def get_list_of_guides(db: Session,
         )
         for record in guides
     ]
-    return GuideListReadSchema(pages=pages, guides=guides_list)
+    return GuideListReadSchema(pages=pages, guides=guides_list, next_cursor=next_cursor,
+                               has_more=has_more)
+
+
+async def get_recently_published_guides(db: AsyncSession, since: datetime, limit: int) -> list:
+    """Get (guide_id, title, first_name, last_name) of newest guides published since given time"""
+    result = await db.execute(select(Guide.guide_id, Guide.title, User.first_name, User.last_name)
+                              .join(Guide.user)
+                              .filter(Guide.published, Guide.last_modified >= since)
+                              .order_by(Guide.last_modified.desc(), Guide.guide_id.desc())
+                              .limit(limit))
+    return result.all()
+
+
+async def get_serialized_list_of_guides(db: AsyncSession,
+                                        page: int,
+                                        page_size: int,
+                                        sort_order: str = RetrieveOrder.descending,
+                                        search: str = '',
+                                        after: str | None = None,
+                                        include_total: bool = True) -> SerializedResponse | None:
+    """Get page of published guides as JSON, reusing it from guides list cache while it's valid
+
+    Returns None when the page is empty. Page can change without any of its guides changing, so
+    it's last modified when it was built, which is never before the change that caused it.
+    """
+    cache_key = (sort_order, page, page_size, search, after, include_total)
+    guides: SerializedResponse | None = guides_list_cache.get(cache_key)
+    if guides is not None:
+        return guides
+    generation: int = guides_list_cache.generation
+    guides_list = await get_list_of_guides(db, page=page, page_size=page_size,
+                                           sort_order=sort_order, search=search,
+                                           after=after, include_total=include_total)
+    if not guides_list.guides:
+        return None
+    content: bytes = guides_list.model_dump_json(by_alias=True).encode()
+    guides = SerializedResponse(content=content, etag=make_etag(content),
+                                last_modified=datetime.now(timezone.utc))
+    tags = {(GUIDE_TAG, guide.guide_id) for guide in guides_list.guides} | \
+           {(USER_TAG, guide.user.user_id) for guide in guides_list.guides}
+    guides_list_cache.set(cache_key, guides, tags=tags, generation=generation)
+    return guides
 
 
-async def search_guides(db: Session, title: str, page: int,
-                        page_size: int) -> GuideListReadSchema | None:
-    guides = await get_list_of_guides(db, page=page, page_size=page_size, search=title)
-    return GuideListReadSchema(pages=guides.pages, guides=guides.guides)
+async def search_guides(db: AsyncSession, title: str, page: int, page_size: int,
+                        after: str | None = None,
+                        include_total: bool = True) -> SerializedResponse | None:
+    guides = await get_serialized_list_of_guides(db, page=page, page_size=page_size,
+                                                 search=title, after=after,
+                                                 include_total=include_total)
+    return guides
 
 
-async def get_guides_by_user_id(db: Session,
+async def get_guides_by_user_id(db: AsyncSession,
                                 user_id: int,
                                 page: int,
                                 page_size: int,
-                                user: User):
+                                user: UserReadSchema,
+                                after: str | None = None,
+                                include_total: bool = True):
     if user.user_id == user_id:
         guides = await get_list_of_guides(db, page=page, page_size=page_size,
-                                          published_only=False, user_id=user_id)
+                                          published_only=False, user_id=user_id, after=after,
+                                          include_total=include_total)
     else:
         guides = await get_list_of_guides(db, page=page, page_size=page_size,
-                                          published_only=True, user_id=user_id)
+                                          published_only=True, user_id=user_id, after=after,
+                                          include_total=include_total)
     return guides
 
 
-async def get_guide_by_id(db: Session, guide_id: int) -> Guide | None:
-    guide: Guide = db.query(Guide).get(guide_id)
+async def get_serialized_guides_by_user_id(db: AsyncSession,
+                                           user_id: int,
+                                           page: int,
+                                           page_size: int,
+                                           user: UserReadSchema,
+                                           after: str | None = None,
+                                           include_total: bool = True) -> SerializedResponse | None:
+    """Get page of user's guides as JSON with ETag of its content, or None when it's empty
+
+    Page isn't cached since its author also sees unpublished guides, so it has no modification
+    time to validate it by.
+    """
+    guides_list = await get_guides_by_user_id(db, user_id=user_id, page=page,
+                                              page_size=page_size, user=user, after=after,
+                                              include_total=include_total)
+    if not guides_list.guides:
+        return None
+    content: bytes = guides_list.model_dump_json(by_alias=True).encode()
+    return SerializedResponse(content=content, etag=make_etag(content))
+
+
+async def get_guide_header(db: AsyncSession, guide_id: int) -> Guide | None:
+    """Get guide without its content and author, for paths that only check ownership or images"""
+    guide: Guide = await db.get(Guide, guide_id,
+                                options=(defer(Guide.content), raiseload(Guide.user)))
+    return guide
+
+
+# Everything guide detail is built from except content, so these are enough to validate it
+guide_detail_columns = (
+    Guide.guide_id,
+    Guide.title,
+    Guide.note,
+    Guide.published,
+    Guide.created_at,
+    Guide.last_modified,
+    Guide.cover_image,
+    Guide.cover_image_variants,
+    User.user_id,
+    User.email,
+    User.first_name,
+    User.last_name,
+    User.is_active,
+    UserDetail.user_detail_id,
+    UserDetail.linkedin,
+    UserDetail.github,
+    UserDetail.website,
+    UserDetail.is_instructor,
+    UserDetail.bio,
+    UserDetail.avatar,
+    UserDetail.avatar_variants,
+    UserDetail.cover_image.label('user_cover_image'),
+    UserDetail.cover_image_variants.label('user_cover_image_variants'),
+    Profession.profession_id,
+    Profession.name.label('profession'),
+)
+
+
+async def get_guide_detail_query(guide_id: int, with_content: bool = True) -> Select:
+    columns = guide_detail_columns + (Guide.content,) if with_content else guide_detail_columns
+    return select(*columns) \
+        .join(User, Guide.user_id == User.user_id) \
+        .outerjoin(UserDetail, User.user_id == UserDetail.user_id) \
+        .outerjoin(Profession, UserDetail.profession_id == Profession.profession_id) \
+        .filter(Guide.guide_id == guide_id)
+
+
+def get_guide_detail_etag(record) -> str:
+    """Content changes always bump last_modified, so it stands in for content in the ETag"""
+    return make_etag(*tuple(record)[:len(guide_detail_columns)])
+
+
+def build_guide_detail(record) -> GuideReadSchema:
+    user_details: UserDetailSchema | None = None
+    if record.user_detail_id is not None:
+        profession: ProfessionReadSchema | None = None
+        if record.profession_id is not None:
+            profession = ProfessionReadSchema(profession_id=record.profession_id,
+                                              name=record.profession)
+        user_details = UserDetailSchema(linkedin=record.linkedin,
+                                        github=record.github,
+                                        website=record.website,
+                                        is_instructor=record.is_instructor,
+                                        bio=record.bio,
+                                        avatar=record.avatar,
+                                        avatar_variants=record.avatar_variants,
+                                        cover_image=record.user_cover_image,
+                                        cover_image_variants=record.user_cover_image_variants,
+                                        profession=profession)
+    return GuideReadSchema(
+        guide_id=record.guide_id,
+        title=record.title,
+        content=record.content,
+        note=record.note,
+        published=record.published,
+        created_at=record.created_at,
+        last_modified=record.last_modified,
+        cover_image=record.cover_image,
+        cover_image_variants=record.cover_image_variants,
+        user=UserReadSchema(user_id=record.user_id,
+                            email=record.email,
+                            first_name=record.first_name,
+                            last_name=record.last_name,
+                            is_active=record.is_active,
+                            user_details=user_details))
+
+
+async def get_guide_detail(db: AsyncSession, guide_id: int) -> GuideReadSchema | None:
+    """Get guide with its author, author details and profession in a single query
+
+    Only plain columns are selected, so building the response never triggers ORM loading.
+    """
+    record = (await db.execute(await get_guide_detail_query(guide_id))).first()
+    if not record:
+        return None
+    return build_guide_detail(record)
+
+
+async def get_serialized_guide_detail(db: AsyncSession,
+                                      guide_id: int) -> SerializedResponse | None:
+    """Get guide detail as JSON, reusing it from guide detail cache while it's valid"""
+    guide: SerializedResponse | None = guide_detail_cache.get(guide_id)
+    if guide is not None:
+        return guide
+    generation: int = guide_detail_cache.generation
+    record = (await db.execute(await get_guide_detail_query(guide_id))).first()
+    if not record:
+        return None
+    # No Last-Modified, author changes don't bump guide's last_modified but do change its detail
+    guide = SerializedResponse(
+        content=build_guide_detail(record).model_dump_json(by_alias=True).encode(),
+        etag=get_guide_detail_etag(record))
+    guide_detail_cache.set(guide_id, guide,
+                           tags=((GUIDE_TAG, guide_id), (USER_TAG, record.user_id)),
+                           generation=generation)
     return guide
 
 
-async def save_guide(db: Session,
+async def get_guide_detail_etag_by_id(db: AsyncSession, guide_id: int) -> str | None:
+    """Get ETag of guide detail without loading its content"""
+    guide: SerializedResponse | None = guide_detail_cache.get(guide_id)
+    if guide is not None:
+        return guide.etag
+    record = (await db.execute(await get_guide_detail_query(guide_id, with_content=False))).first()
+    if not record:
+        return None
+    return get_guide_detail_etag(record)
+
+
+async def save_guide(db: AsyncSession,
                      data: GuideCreateUpdateSchema,
                      user_id: int,
                      guide=None) -> Guide:
     if not guide:
         guide = Guide()
+    was_published: bool = bool(guide.published)
     guide.title = data.title
     guide.content = data.content
     guide.note = data.note
     guide.published = data.published
     guide.user_id = user_id
     db.add(guide)
-    db.commit()
-    db.refresh(guide)
+    await db.commit()
+    invalidate_guides_count()
+    invalidate_guides_responses(guide_id=guide.guide_id,
+                                all_lists=was_published or guide.published)
     return guide
 
 
-async def save_featured_image(file: UploadFile, db: Session, guide: Guide) -> Guide:
+async def save_featured_image(file: UploadFile, db: AsyncSession, guide: Guide) -> Guide:
     """Check if cover image exists and create it if not. If it exists then do the update"""
 
     old_cover_image = guide.cover_image
+    old_cover_image_variants = guide.cover_image_variants
 
-    file_path = get_featured_image_upload_path(str(guide.guide_id), file.filename)
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    finally:
-        file.file.close()
-
-    guide.cover_image = file_path
+    media: MediaObject = await store_media(db, file)
+    guide.cover_image = media.path
+    guide.cover_image_variants = media.variants
+    remove_old_cover_image: bool = await release_media(db, old_cover_image)
 
     db.add(guide)
-    db.commit()
+    await db.commit()
+    invalidate_guides_responses(guide_id=guide.guide_id)
 
-    if old_cover_image and os.path.exists(old_cover_image):
-        os.remove(old_cover_image)
+    if remove_old_cover_image:
+        await remove_media(old_cover_image, old_cover_image_variants)
 
     return guide
 
 
-async def delete_featured_image(db: Session, guide: Guide) -> None:
-    image = guide.cover_image
-
-    if image and os.path.exists(image):
-        os.remove(image)
+async def delete_featured_image(db: AsyncSession, guide: Guide) -> None:
+    image, image_variants = guide.cover_image, guide.cover_image_variants
+    remove_cover_image: bool = await release_media(db, image)
     guide.cover_image = None
+    guide.cover_image_variants = None
     db.add(guide)
-    db.commit()
+    await db.commit()
+    invalidate_guides_responses(guide_id=guide.guide_id)
+    if remove_cover_image:
+        await remove_media(image, image_variants)
     return None
 
 
-async def delete_guide(db: Session, guide: Guide) -> None:
+async def delete_guide(db: AsyncSession, guide: Guide) -> None:
     await delete_featured_image(db, guide)
-    db.delete(guide)
-    db.commit()
+    await db.delete(guide)
+    await db.commit()
+    invalidate_guides_count()
+    invalidate_guides_responses(guide_id=guide.guide_id, all_lists=guide.published)
     return None
@@ -1,14 +1,21 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
-from starlette.staticfiles import StaticFiles
 
-from config import ENVIRONMENT, SHOW_DOCS_ENVIRONMENT
+from config import ENVIRONMENT, SHOW_DOCS_ENVIRONMENT, FORWARDED_ALLOW_IPS
 import core.service as core_service
 from core.middlewares import ExceptionHandlingMiddleware
 from auth import router as auth_router
 from core.constants import MEDIA_ROOT
 from guides import router as guides_router
 from users import router as users_router
+from users import service as users_service
+from core.settings import MAIL_OUTBOX_WORKERS
+from utils.mail.outbox import run_outbox_worker
+from utils.mail.send_mail import smtp_pool
+from utils.media_files import MediaFiles
 
 app_configs = {'title': 'Guidio'}
 
@@ -20,10 +27,22 @@ def is_debug() -> bool:
     return False if ENVIRONMENT != 'dev' else True
 
 
-app = FastAPI(**app_configs)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    profession_index_task = asyncio.create_task(users_service.keep_profession_index_fresh())
+    outbox_tasks = [asyncio.create_task(run_outbox_worker()) for _ in range(MAIL_OUTBOX_WORKERS)]
+    yield
+    profession_index_task.cancel()
+    for task in outbox_tasks:
+        task.cancel()
+    await asyncio.gather(*outbox_tasks, return_exceptions=True)
+    await smtp_pool.close()
+
+
+app = FastAPI(lifespan=lifespan, **app_configs)
 app.add_middleware(ExceptionHandlingMiddleware)
 core_service.create_media_root()
-app.mount("/media", StaticFiles(directory=MEDIA_ROOT), name="media")
+app.mount("/media", MediaFiles(directory=MEDIA_ROOT), name="media")
 app.include_router(auth_router.router,
                    prefix="/auth",
                    tags=["auth"])
@@ -37,8 +56,10 @@ app.include_router(guides_router.router,
 
 def main():
     if is_debug():
-        uvicorn.run('main:app', host="0.0.0.0", port=8000, reload=True)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+        uvicorn.run('main:app', host="0.0.0.0", port=8000, reload=True,
+                    proxy_headers=True, forwarded_allow_ips=FORWARDED_ALLOW_IPS)
+    uvicorn.run(app, host="0.0.0.0", port=8000,
+                proxy_headers=True, forwarded_allow_ips=FORWARDED_ALLOW_IPS)
 
 
 if __name__ == "__main__":
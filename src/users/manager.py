@@ -1,48 +1,53 @@
-from fastapi import UploadFile
-from sqlalchemy.orm import Session
+from fastapi import UploadFile, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth.exceptions import UnauthorizedException
 from core.exceptions import ImageNotFoundException
 from core.models import User
 from users import service, schemas, exceptions
 from utils.auth import verify_password
+from utils.http import conditional_response
 
 
-async def get_professions_by_name(name: str, db: Session) -> list[schemas.ProfessionReadSchema]:
+async def get_professions_by_name(name: str,
+                                  db: AsyncSession) -> list[schemas.ProfessionReadSchema]:
     professions = await service.get_professions_by_name(name, db)
     return professions
 
 
-async def get_instructors(page: int, page_size: int, db: Session):
-    instructors = await service.get_paginated_instructors(db, page - 1, page_size)
-    if page > instructors.pages:
+async def get_instructors(page: int, page_size: int, db: AsyncSession,
+                          include_total: bool = True):
+    instructors = await service.get_paginated_instructors(db, page - 1, page_size,
+                                                          include_total=include_total)
+    if not instructors.users:
         raise exceptions.InstructorsNotFoundException()
     return instructors
 
 
-async def search_instructors(search: str, page: int, page_size: int, db: Session):
-    total_pages = await service.get_number_of_instructors_from_search(db, search, page_size)
-    if page > total_pages:
-        raise exceptions.InstructorsNotFoundException()
+async def search_instructors(search: str, page: int, page_size: int, db: AsyncSession):
     instructors = await service.get_paginated_instructors_by_search(db, page=page - 1,
                                                                     page_size=page_size,
                                                                     search=search)
-    return schemas.UserReadSchemaWithPages(pages=total_pages, users=instructors)
+    if not instructors.users:
+        raise exceptions.InstructorsNotFoundException()
+    return instructors
 
 
-async def get_user_avatar(user: User):
+async def get_user_avatar(user: schemas.UserReadSchema):
     avatar = await service.get_avatar(user)
     if avatar is None:
         raise ImageNotFoundException()
-    return schemas.UserAvatarSchema(avatar=avatar)
+    return schemas.UserAvatarSchema(avatar=avatar,
+                                    avatar_variants=user.user_details.avatar_variants)
 
 
-async def save_user_avatar(file: UploadFile, db: Session, user: User) -> schemas.UserReadSchema:
+async def save_user_avatar(file: UploadFile, db: AsyncSession,
+                           user: User) -> schemas.UserReadSchema:
     saved = await service.save_avatar(file, db, user)
     return saved
 
 
-async def delete_user_avatar(db: Session, user: User):
+async def delete_user_avatar(db: AsyncSession, user: User):
     avatar = user.user_details.avatar
     if avatar is None:
         raise ImageNotFoundException()
@@ -50,19 +55,20 @@ async def delete_user_avatar(db: Session, user: User):
     return None
 
 
-async def get_user_cover_image(user: User):
+async def get_user_cover_image(user: schemas.UserReadSchema):
     image = await service.get_cover_image(user)
     if image is None:
         raise ImageNotFoundException()
-    return schemas.UserCoverImageSchema(cover_image=image)
+    return schemas.UserCoverImageSchema(
+        cover_image=image, cover_image_variants=user.user_details.cover_image_variants)
 
 
-async def save_user_cover_image(file: UploadFile, db: Session, user: User):
+async def save_user_cover_image(file: UploadFile, db: AsyncSession, user: User):
     saved = await service.save_cover_image(file, db, user)
     return saved
 
 
-async def delete_user_cover_image(db: Session, user: User):
+async def delete_user_cover_image(db: AsyncSession, user: User):
     image = user.user_details.cover_image
     if image is None:
         raise ImageNotFoundException()
@@ -70,33 +76,33 @@ async def delete_user_cover_image(db: Session, user: User):
     return None
 
 
-async def get_user_profile_by_id(user_id: int, db: Session):
-    user = await service.get_user_profile_by_id(user_id, db)
+async def get_user_profile_by_id(request: Request, user_id: int,
+                                 db: AsyncSession) -> Response:
+    user = await service.get_serialized_user_profile(user_id, db)
     if not user:
         raise exceptions.UserNotFoundException()
-    return user
+    return conditional_response(request, user)
 
 
-async def update_user_profile(user_id: int, data: schemas.UserProfileUpdateSchema, db: Session,
+async def update_user_profile(user_id: int, data: schemas.UserProfileUpdateSchema, db: AsyncSession,
                               user: User):
     if user_id != user.user_id:
         raise UnauthorizedException()
     if data.user_details.profession_id:
-        profession = await service.get_profession_by_id(db, data.user_details.profession_id)
-        if not profession:
-            raise exceptions.UserNotFoundException()
+        if not await service.profession_exists(db, data.user_details.profession_id):
+            raise exceptions.ProfessionDoesNotExistException()
     await service.update_user_profile(data, db, user)
     return user
 
 
-async def delete_user_profile(user_id: int, db: Session, user: User) -> None:
+async def delete_user_profile(user_id: int, db: AsyncSession, user: User) -> None:
     if not user or user_id != user.user_id:
         raise UnauthorizedException()
     return await service.delete_user_profile(db, user_id)
 
 
-async def update_user_password(user_id: int, data: schemas.UserPasswordUpdateSchema, db: Session,
-                               user: User):
+async def update_user_password(user_id: int, data: schemas.UserPasswordUpdateSchema,
+                               db: AsyncSession, user: User):
     if user_id != user.user_id:
         raise UnauthorizedException()
     if not await verify_password(data.current_password, user.password):
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Query, status, Depends, UploadFile, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Query, status, Depends, UploadFile, Response, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.service import user_if_profile_is_active
+from auth.service import user_if_profile_is_active, principal_if_profile_is_active
 from core.dependencies import DBDependency
 from core.models import User
 from core.settings import AUTH_TOKEN
@@ -13,8 +13,8 @@ router = APIRouter()
 @router.get(path="/professions",
             description="Get professions based on search by name",
             response_model=list[schemas.ProfessionReadSchema])
-async def get_profession_by_name(name: str,
-                                 db: Session = DBDependency) -> list[schemas.ProfessionReadSchema]:
+async def get_profession_by_name(
+        name: str, db: AsyncSession = DBDependency) -> list[schemas.ProfessionReadSchema]:
     professions = await manager.get_professions_by_name(name, db)
     return professions
 
@@ -24,8 +24,10 @@ async def get_profession_by_name(name: str,
             response_model=schemas.UserReadSchemaWithPages)
 async def get_instructors(page: int = Query(default=1, ge=1, description="Page to request"),
                           page_size: int = Query(default=50, ge=1, le=100, description="Page size"),
-                          db: Session = DBDependency) -> schemas.UserReadSchemaWithPages:
-    return await manager.get_instructors(page, page_size, db)
+                          include_total: bool = Query(default=True,
+                                                      description="Count total number of pages"),
+                          db: AsyncSession = DBDependency) -> schemas.UserReadSchemaWithPages:
+    return await manager.get_instructors(page, page_size, db, include_total)
 
 
 @router.get(path="/instructors/search",
@@ -36,7 +38,7 @@ async def search_instructors(search: str,
                              page: int = Query(default=1, ge=1, description="Page to request"),
                              page_size: int = Query(default=50, ge=1, le=100,
                                                     description="Page size"),
-                             db: Session = DBDependency):
+                             db: AsyncSession = DBDependency):
     return await manager.search_instructors(search, page, page_size, db)
 
 
@@ -44,7 +46,7 @@ async def search_instructors(search: str,
             description="Get user avatar",
             response_model=schemas.UserAvatarSchema,
             status_code=status.HTTP_200_OK)
-async def get_avatar(user: User = Depends(user_if_profile_is_active)):
+async def get_avatar(user: schemas.UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.get_user_avatar(user)
 
 
@@ -52,7 +54,7 @@ async def get_avatar(user: User = Depends(user_if_profile_is_active)):
              description="Save user avatar",
              response_model=schemas.UserReadSchema,
              status_code=status.HTTP_201_CREATED)
-async def save_avatar(file: UploadFile, db: Session = DBDependency,
+async def save_avatar(file: UploadFile, db: AsyncSession = DBDependency,
                       user: User = Depends(user_if_profile_is_active)):
     return await manager.save_user_avatar(file, db, user)
 
@@ -61,7 +63,7 @@ async def save_avatar(file: UploadFile, db: Session = DBDependency,
             description="Update user avatar",
             response_model=schemas.UserReadSchema,
             status_code=status.HTTP_200_OK)
-async def update_avatar(file: UploadFile, db: Session = DBDependency,
+async def update_avatar(file: UploadFile, db: AsyncSession = DBDependency,
                         user: User = Depends(user_if_profile_is_active)):
     return await manager.save_user_avatar(file, db, user)
 
@@ -69,7 +71,7 @@ async def update_avatar(file: UploadFile, db: Session = DBDependency,
 @router.delete(path="/avatar",
                description="Delete user avatar",
                status_code=status.HTTP_204_NO_CONTENT)
-async def delete_avatar(db: Session = DBDependency,
+async def delete_avatar(db: AsyncSession = DBDependency,
                         user: User = Depends(user_if_profile_is_active)):
     return await manager.delete_user_avatar(db, user)
 
@@ -78,7 +80,8 @@ async def delete_avatar(db: Session = DBDependency,
             description="Get user cover image",
             response_model=schemas.UserCoverImageSchema,
             status_code=status.HTTP_200_OK)
-async def get_cover_image(user: User = Depends(user_if_profile_is_active)):
+async def get_cover_image(
+        user: schemas.UserReadSchema = Depends(principal_if_profile_is_active)):
     return await manager.get_user_cover_image(user)
 
 
@@ -86,7 +89,7 @@ async def get_cover_image(user: User = Depends(user_if_profile_is_active)):
              description="Save user cover image",
              response_model=schemas.UserReadSchema,
              status_code=status.HTTP_201_CREATED)
-async def save_cover_image(file: UploadFile, db: Session = DBDependency,
+async def save_cover_image(file: UploadFile, db: AsyncSession = DBDependency,
                            user: User = Depends(user_if_profile_is_active)):
     return await manager.save_user_cover_image(file, db, user)
 
@@ -95,7 +98,7 @@ async def save_cover_image(file: UploadFile, db: Session = DBDependency,
             description="Update user cover image",
             response_model=schemas.UserReadSchema,
             status_code=status.HTTP_200_OK)
-async def update_cover_image(file: UploadFile, db: Session = DBDependency,
+async def update_cover_image(file: UploadFile, db: AsyncSession = DBDependency,
                              user: User = Depends(user_if_profile_is_active)):
     return await manager.save_user_cover_image(file, db, user)
 
@@ -103,7 +106,7 @@ async def update_cover_image(file: UploadFile, db: Session = DBDependency,
 @router.delete(path="/cover_image",
                description="Delete user cover image",
                status_code=status.HTTP_204_NO_CONTENT)
-async def delete_cover_image(db: Session = DBDependency,
+async def delete_cover_image(db: AsyncSession = DBDependency,
                              user: User = Depends(user_if_profile_is_active)):
     return await manager.delete_user_cover_image(db, user)
 
@@ -111,15 +114,16 @@ async def delete_cover_image(db: Session = DBDependency,
 @router.get(path="/{user_id}",
             description="Get user profile by id",
             response_model=schemas.UserReadSchema)
-async def get_user_profile_by_id(user_id: int, db: Session = DBDependency):
-    return await manager.get_user_profile_by_id(user_id, db)
+async def get_user_profile_by_id(request: Request, user_id: int,
+                                 db: AsyncSession = DBDependency):
+    return await manager.get_user_profile_by_id(request, user_id, db)
 
 
 @router.put(path='/{user_id}',
             description="Update user profile",
             response_model=schemas.UserReadSchema)
 async def update_user_profile(user_id: int, data: schemas.UserProfileUpdateSchema,
-                              db: Session = DBDependency,
+                              db: AsyncSession = DBDependency,
                               user: User = Depends(user_if_profile_is_active)):
     return await manager.update_user_profile(user_id, data, db, user)
 
@@ -127,7 +131,7 @@ async def update_user_profile(user_id: int, data: schemas.UserProfileUpdateSchem
 @router.delete(path='/{user_id}',
                description="Delete user profile",
                status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user_profile(user_id: int, response: Response, db: Session = DBDependency,
+async def delete_user_profile(user_id: int, response: Response, db: AsyncSession = DBDependency,
                               user: User = Depends(user_if_profile_is_active)):
     await manager.delete_user_profile(user_id, db, user)
     response.delete_cookie(AUTH_TOKEN)
@@ -140,6 +144,6 @@ async def delete_user_profile(user_id: int, response: Response, db: Session = DB
             response_model=schemas.UserReadSchema)
 async def update_user_password(user_id: int,
                                data: schemas.UserPasswordUpdateSchema,
-                               db: Session = DBDependency,
+                               db: AsyncSession = DBDependency,
                                user: User = Depends(user_if_profile_is_active)):
     return await manager.update_user_password(user_id, data, db, user)
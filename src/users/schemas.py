@@ -1,6 +1,6 @@
 from pydantic import EmailStr, Field
 
-from core.schemas import BaseModelSchema, UserPasswordSchema
+from core.schemas import BaseModelSchema, UserPasswordSchema, ImageVariantsSchema
 
 
 class ProfessionReadSchema(BaseModelSchema):
@@ -18,7 +18,9 @@ class UserDetailSchema(BaseModelSchema):
     is_instructor: bool
     bio: str | None
     avatar: str | None
+    avatar_variants: ImageVariantsSchema | None = None
     cover_image: str | None
+    cover_image_variants: ImageVariantsSchema | None = None
     profession: ProfessionReadSchema | None
 
     class Config:
@@ -27,6 +29,7 @@ class UserDetailSchema(BaseModelSchema):
 
 class UserAvatarSchema(BaseModelSchema):
     avatar: str | None
+    avatar_variants: ImageVariantsSchema | None = None
 
     class Config:
         from_attributes = True
@@ -34,6 +37,7 @@ class UserAvatarSchema(BaseModelSchema):
 
 class UserCoverImageSchema(BaseModelSchema):
     cover_image: str | None
+    cover_image_variants: ImageVariantsSchema | None = None
 
     class Config:
         from_attributes = True
@@ -89,6 +93,7 @@ class UserListReadSchema(BaseModelSchema):
     first_name: str
     last_name: str
     avatar: str | None
+    avatar_variants: ImageVariantsSchema | None = None
     profession: str | None
 
 
@@ -102,7 +107,7 @@ class UserReadSchema(UserBaseSchema):
 
 
 class UserReadSchemaWithPages(BaseModelSchema):
-    pages: int
+    pages: int | None
     users: list[UserReadSchema]
 
 
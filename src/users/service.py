@@ -1,72 +1,66 @@
-import os
-import shutil
-from datetime import datetime
-from pathlib import Path
+import asyncio
+import logging
+from typing import AsyncIterator, Sequence
 
 from fastapi import UploadFile
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update, func
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy.sql import Select
 
 # from auth.service import get_password_hash # TODO: fix this because it is inside a class
-from core.constants import MEDIA_ROOT
-from core.models import User, UserDetail, Profession, Guide
-from core.service import count_number_of_pages
-from users.schemas import UserProfileUpdateSchema, UserPasswordUpdateSchema, UserDetailUpdateSchema, \
-    UserReadSchemaWithPages
+from core.constants import INSTRUCTORS_COUNT_KEY
+from core.dependencies import DBSession
+from core.models import User, UserDetail, Profession, Guide, MediaObject
+from core.service import count_number_of_pages, get_number_of_rows, invalidate_guides_count, \
+    invalidate_instructors_count, invalidate_guides_responses, invalidate_principal
+from core.settings import PROFESSION_INDEX_REFRESH_SECONDS
+from users.schemas import ProfessionReadSchema, UserProfileUpdateSchema, UserPasswordUpdateSchema, \
+    UserDetailUpdateSchema, UserReadSchemaWithPages, UserReadSchema
 from utils.auth import get_password_hash
+from utils.http import SerializedResponse, make_etag
+from utils.media import store_media, release_media, remove_media
+from utils.professions import profession_index
 
+# Loads everything UserReadSchema needs in the same query, so serializing a page of users doesn't
+# issue extra queries per user
+user_profile_options = (joinedload(User.user_details).joinedload(UserDetail.profession),)
+# Same for queries which already join user details to filter instructors
+instructor_profile_options = (contains_eager(User.user_details).joinedload(UserDetail.profession),)
 
-async def get_instructors_by_search(db: Session, search: str):
-    return db.query(User).filter(or_(
-        User.first_name.ilike(f"%{search}%"),
-        User.last_name.ilike(f"%{search}%")
-    )).join(UserDetail).filter(UserDetail.is_instructor)
 
+async def get_instructors_by_search(search: str) -> Select:
+    """Get instructors whose full name contains the search or is similar to it
 
-async def get_paginated_instructors_by_search(db: Session, page: int, page_size: int, search: str):
-    offset: int = page * page_size
-    instructors_from_search = await get_instructors_by_search(db, search)
-    return instructors_from_search.offset(offset).limit(page_size).all()
-
-
-async def get_number_of_instructors_from_search(db: Session,
-                                                search: str,
-                                                page_size: int):
-    instructors_from_search = await get_instructors_by_search(db, search)
-    count_of_instructors = len(instructors_from_search.all())
-    division: tuple[int, int] = divmod(count_of_instructors, page_size)
-    pages: int = division[0] + 1 if division[1] else division[0]
-    return pages
-
-
-async def create_upload_path(directory: str, filename: str):
-    if not os.path.exists(directory):
-        Path(directory).mkdir(parents=True, exist_ok=True)
-    if not os.path.exists(directory + filename):
-        filename_parts = filename.split(".")
-        timestamp = str(int(datetime.now().timestamp()))
-        filename = "".join(filename_parts[:-1]) + "_" + timestamp + "." + filename_parts[-1]
-    open(f'{directory}{filename}', 'wb').close()
-    return directory + filename
-
-
-async def avatar_upload_path(first_name: str, last_name: str, filename: str):
-    user_name = first_name + "_" + last_name
-    directory = f"{MEDIA_ROOT}/users/{user_name}/avatar/"
+    Both conditions are served by the trigram index on full name. Similar names are matched by
+    word similarity, so "john bro" finds John Brown and typos like "jon brown" still match.
+    """
+    return select(User).filter(or_(
+        User.full_name.ilike(f"%{search}%"),
+        User.full_name.op('%>')(search)
+    )).join(UserDetail).filter(UserDetail.is_instructor) \
+        .order_by(func.word_similarity(search, User.full_name).desc(), User.user_id)
 
-    path = await create_upload_path(directory, filename)
-    path_to_save = 'media' + path.split('media')[1]
 
-    return path_to_save
+async def get_paginated_instructors_by_search(db: AsyncSession, page: int, page_size: int,
+                                              search: str) -> UserReadSchemaWithPages:
+    """Get page of instructors matching search together with total number of pages
 
-
-async def cover_image_upload_path(first_name: str, last_name: str, filename: str):
-    user_name = first_name + "_" + last_name
-    directory = f"{MEDIA_ROOT}/users/{user_name}/cover_image/"
-
-    path = await create_upload_path(directory, filename)
-    path_to_save = 'media' + path.split('media')[1]
-    return path_to_save
+    Total number of matches is computed by a window function in the same query, so only rows of
+    the requested page are ever loaded.
+    """
+    offset: int = page * page_size
+    instructors_from_search = await get_instructors_by_search(search)
+    result = await db.execute(instructors_from_search
+                              .options(*instructor_profile_options)
+                              .add_columns(func.count().over().label('total'))
+                              .offset(offset)
+                              .limit(page_size))
+    rows = result.all()
+    count_of_instructors: int = rows[0].total if rows else 0
+    pages: int = await count_number_of_pages(count_of_instructors, page_size)
+    return UserReadSchemaWithPages(pages=pages, users=[row.User for row in rows])
 
 
 async def get_avatar(user: User) -> str | None:
@@ -75,37 +69,39 @@ async def get_avatar(user: User) -> str | None:
     return user.user_details.avatar
 
 
-async def save_avatar(file: UploadFile, db: Session, user: User) -> User:
+async def save_avatar(file: UploadFile, db: AsyncSession, user: User) -> User:
     """Check if avatar exists and create it if not. If it exists then do the update"""
 
     old_user_avatar = user.user_details.avatar
+    old_avatar_variants = user.user_details.avatar_variants
 
-    file_path = await avatar_upload_path(user.first_name, user.last_name, file.filename)
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    finally:
-        file.file.close()
-
-    user.user_details.avatar = file_path
+    media: MediaObject = await store_media(db, file)
+    user.user_details.avatar = media.path
+    user.user_details.avatar_variants = media.variants
+    remove_old_avatar: bool = await release_media(db, old_user_avatar)
 
     db.add(user)
-    db.commit()
+    await db.commit()
+    invalidate_guides_responses(user_id=user.user_id)
+    invalidate_principal(user.user_id)
 
-    if old_user_avatar and os.path.exists(old_user_avatar):
-        os.remove(old_user_avatar)
+    if remove_old_avatar:
+        await remove_media(old_user_avatar, old_avatar_variants)
 
     return user
 
 
-async def delete_avatar(db: Session, user: User):
-    avatar = user.user_details.avatar
-
-    if os.path.exists(avatar):
-        os.remove(avatar)
+async def delete_avatar(db: AsyncSession, user: User):
+    avatar, avatar_variants = user.user_details.avatar, user.user_details.avatar_variants
+    remove_avatar: bool = await release_media(db, avatar)
     user.user_details.avatar = None
+    user.user_details.avatar_variants = None
     db.add(user)
-    db.commit()
+    await db.commit()
+    invalidate_guides_responses(user_id=user.user_id)
+    invalidate_principal(user.user_id)
+    if remove_avatar:
+        await remove_media(avatar, avatar_variants)
     return None
 
 
@@ -115,68 +111,133 @@ async def get_cover_image(user: User) -> str | None:
     return user.user_details.cover_image
 
 
-async def save_cover_image(file: UploadFile, db: Session, user: User) -> User:
+async def save_cover_image(file: UploadFile, db: AsyncSession, user: User) -> User:
     """Check if cover image exists and create it if not. If it exists then do the update"""
 
     old_cover_image = user.user_details.cover_image
+    old_cover_image_variants = user.user_details.cover_image_variants
 
-    file_path = await cover_image_upload_path(user.first_name, user.last_name, file.filename)
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    finally:
-        file.file.close()
-
-    user.user_details.cover_image = file_path
+    media: MediaObject = await store_media(db, file)
+    user.user_details.cover_image = media.path
+    user.user_details.cover_image_variants = media.variants
+    remove_old_cover_image: bool = await release_media(db, old_cover_image)
 
     db.add(user)
-    db.commit()
+    await db.commit()
+    invalidate_guides_responses(user_id=user.user_id)
+    invalidate_principal(user.user_id)
 
-    if old_cover_image and os.path.exists(old_cover_image):
-        os.remove(old_cover_image)
+    if remove_old_cover_image:
+        await remove_media(old_cover_image, old_cover_image_variants)
 
     return user
 
 
-async def delete_cover_image(db: Session, user: User):
-    image = user.user_details.cover_image
-
-    if os.path.exists(image):
-        os.remove(image)
+async def delete_cover_image(db: AsyncSession, user: User):
+    image, image_variants = user.user_details.cover_image, user.user_details.cover_image_variants
+    remove_cover_image: bool = await release_media(db, image)
     user.user_details.cover_image = None
+    user.user_details.cover_image_variants = None
     db.add(user)
-    db.commit()
+    await db.commit()
+    invalidate_guides_responses(user_id=user.user_id)
+    invalidate_principal(user.user_id)
+    if remove_cover_image:
+        await remove_media(image, image_variants)
     return None
 
 
-async def get_paginated_instructors(db: Session, offset, limit) -> UserReadSchemaWithPages:
+async def get_paginated_instructors(db: AsyncSession, offset, limit,
+                                    include_total: bool = True) -> UserReadSchemaWithPages:
     offset: int = offset * limit
-    all_instructors = db.query(User).join(User.user_details) \
-        .filter(UserDetail.is_instructor)
-    paginated_instructors: list[User] = all_instructors.offset(offset).limit(limit).all()
-    count_of_instructors: int = all_instructors.count()
-    pages: int = await count_number_of_pages(count_of_instructors, limit)
+    all_instructors = select(User).join(User.user_details) \
+        .filter(UserDetail.is_instructor).order_by(User.user_id)
+    result = await db.execute(all_instructors.options(*instructor_profile_options)
+                              .offset(offset).limit(limit))
+    paginated_instructors: list[User] = result.scalars().all()
+    pages: int | None = None
+    if include_total:
+        count_of_instructors: int = await get_number_of_rows(db, all_instructors,
+                                                             cache_key=INSTRUCTORS_COUNT_KEY,
+                                                             allow_estimate=True)
+        pages = await count_number_of_pages(count_of_instructors, limit)
     return UserReadSchemaWithPages(pages=pages, users=paginated_instructors)
 
 
-async def get_profession_by_id(db: Session, profession_id: int) -> Profession | None:
-    profession = db.query(Profession).get(profession_id)
+async def stream_active_users(db: AsyncSession, after_user_id: int,
+                              batch_size: int) -> AsyncIterator[Sequence[Row]]:
+    """Stream (user_id, email, first_name) of active users in batches, ordered by id
+
+    Rows are fetched from a server side cursor, so memory use doesn't grow with number of users.
+    """
+    result = await db.stream(select(User.user_id, User.email, User.first_name)
+                             .filter(User.is_active, User.user_id > after_user_id)
+                             .order_by(User.user_id)
+                             .execution_options(yield_per=batch_size))
+    async for batch in result.partitions():
+        yield batch
+
+
+async def get_profession_by_id(db: AsyncSession, profession_id: int) -> Profession | None:
+    profession = await db.get(Profession, profession_id)
     return profession
 
 
-async def get_professions_by_name(name: str, db: Session) -> list[Profession] | None:
-    professions = db.query(Profession).filter(Profession.name.ilike(f'%{name}%')).all()
+async def profession_exists(db: AsyncSession, profession_id: int) -> bool:
+    if profession_index.loaded:
+        return profession_index.get(profession_id) is not None
+    return await get_profession_by_id(db, profession_id) is not None
+
+
+async def refresh_profession_index(db: AsyncSession) -> None:
+    result = await db.execute(select(Profession))
+    profession_index.load([ProfessionReadSchema.model_validate(profession)
+                           for profession in result.scalars().all()])
+
+
+async def keep_profession_index_fresh() -> None:
+    """Load profession index and reload it periodically, so codebook changes reach every worker
+
+    Until the first load succeeds, professions are searched in the database.
+    """
+    while True:
+        try:
+            async with DBSession() as db:
+                await refresh_profession_index(db)
+        except Exception as e:
+            logging.error(f"Refreshing profession index failed: {str(e)}")
+        await asyncio.sleep(PROFESSION_INDEX_REFRESH_SECONDS)
+
+
+async def get_professions_by_name(name: str,
+                                  db: AsyncSession) -> list[ProfessionReadSchema | Profession]:
+    if profession_index.loaded:
+        return profession_index.search(name)
+    result = await db.execute(select(Profession)
+                              .filter(Profession.name.ilike(f'%{name}%'))
+                              .order_by(func.similarity(Profession.name, name).desc(),
+                                        Profession.name))
+    professions = result.scalars().all()
     return professions
 
 
-async def get_user_profile_by_id(user_id: int, db: Session) -> User | None:
-    user = db.query(User).get(user_id)
+async def get_user_profile_by_id(user_id: int, db: AsyncSession) -> User | None:
+    user = await db.get(User, user_id, options=user_profile_options)
     return user
 
 
-async def update_user_details(data: UserDetailUpdateSchema, db: Session, db_user: User):
-    user_detail: UserDetail = db.query(UserDetail) \
-        .filter(UserDetail.user_id == db_user.user_id).first()
+async def get_serialized_user_profile(user_id: int, db: AsyncSession) -> SerializedResponse | None:
+    """Get user profile as JSON with ETag of its content, profile has no modification time"""
+    user = await get_user_profile_by_id(user_id, db)
+    if not user:
+        return None
+    content: bytes = UserReadSchema.model_validate(user).model_dump_json(by_alias=True).encode()
+    return SerializedResponse(content=content, etag=make_etag(content))
+
+
+async def update_user_details(data: UserDetailUpdateSchema, db: AsyncSession, db_user: User):
+    result = await db.execute(select(UserDetail).filter(UserDetail.user_id == db_user.user_id))
+    user_detail: UserDetail = result.scalars().first()
     if user_detail:
         user_detail.linkedin = data.linkedin
         user_detail.github = data.github
@@ -193,40 +254,61 @@ async def update_user_details(data: UserDetailUpdateSchema, db: Session, db_user
                                      bio=data.bio,
                                      profession_id=data.profession_id)
         db.add(new_user_detail)
-    db.commit()
+    await db.commit()
 
 
 async def update_user_profile(data: UserProfileUpdateSchema,
-                              db: Session, db_user: User) -> User:
+                              db: AsyncSession, db_user: User) -> User:
     db_user.email = data.email
     db_user.first_name = data.first_name
     db_user.last_name = data.last_name
 
     await update_user_details(data.user_details, db, db_user)
     # Update guides if is_instructor is set to false
+    unpublished_guides: int = 0
     if not data.user_details.is_instructor:
-        guides = db.query(Guide).filter(Guide.user_id == db_user.user_id).all()
-        if guides:
-            for guide in guides:
-                guide.published = False
-
-    db.commit()
-    db.refresh(db_user)
+        result = await db.execute(update(Guide)
+                                  .where(Guide.user_id == db_user.user_id, Guide.published)
+                                  .values(published=False)
+                                  .execution_options(synchronize_session=False))
+        unpublished_guides = result.rowcount
+
+    await db.commit()
+    invalidate_guides_count()
+    invalidate_instructors_count()
+    invalidate_guides_responses(user_id=db_user.user_id, all_lists=bool(unpublished_guides))
+    invalidate_principal(db_user.user_id)
+    # Session does not expire on commit, so reload details to pick up new ones and new profession
+    await db.get(User, db_user.user_id, options=user_profile_options, populate_existing=True)
     return db_user
 
 
-async def delete_user_profile(db: Session, user_id: int) -> None:
-    user: User = db.query(User).get(user_id)
-    db.delete(user)
-    db.commit()
+async def delete_user_profile(db: AsyncSession, user_id: int) -> None:
+    user: User = await db.get(User, user_id)
+    result = await db.execute(select(Guide.cover_image, Guide.cover_image_variants)
+                              .filter(Guide.user_id == user_id))
+    images = [tuple(guide) for guide in result.all()]
+    if user.user_details:
+        images += [(user.user_details.avatar, user.user_details.avatar_variants),
+                   (user.user_details.cover_image, user.user_details.cover_image_variants)]
+    # Released before the cascade deletes columns referring to them
+    images_to_remove = [image for image in images if await release_media(db, image[0])]
+    await db.delete(user)
+    await db.commit()
+    for path, variants in images_to_remove:
+        await remove_media(path, variants)
+    invalidate_guides_count()
+    invalidate_instructors_count()
+    invalidate_guides_responses(user_id=user_id, all_lists=True)
+    invalidate_principal(user_id)
     return None
 
 
-async def update_user_password(db: Session,
+async def update_user_password(db: AsyncSession,
                                data: UserPasswordUpdateSchema,
                                user: User) -> User:
     hashed_password = await get_password_hash(data.password)
     user.password = hashed_password
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_principal(user.user_id)
     return user
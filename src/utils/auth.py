@@ -1,23 +1,34 @@
 import base64
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from jose import jwt
 from passlib.context import CryptContext
 
 from auth.dependencies import verify_token
-from auth.exceptions import UnauthorizedException
+from auth.exceptions import UnauthorizedException, TokenExpiredException
+from core.cache import TTLCache
+from core.settings import VERIFIED_TOKEN_CACHE_MAX_ENTRIES, VERIFIED_TOKEN_CACHE_TTL_SECONDS, \
+    PASSWORD_HASHING_WORKERS, PASSWORD_HASHING_QUEUE_LIMIT, PASSWORD_HASHING_RETRY_AFTER_SECONDS
+from core.workers import BoundedPool
 from src.config import SECRET_KEY, ALGORITHM
-from src.config import TOKEN_EXP_MINUTES
-
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-async def get_base64_subject_from_token(token: str) -> str:
-    payload = await verify_token(token)
-    sub_base64 = payload.get("sub")
-    if sub_base64 is None:
-        raise UnauthorizedException()
-    return sub_base64
+from src.config import TOKEN_EXP_MINUTES, BCRYPT_ROUNDS
+
+# Hashes with any other cost need update, so changing BCRYPT_ROUNDS rehashes passwords on login
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                              bcrypt__default_rounds=int(BCRYPT_ROUNDS),
+                              bcrypt__min_rounds=int(BCRYPT_ROUNDS),
+                              bcrypt__max_rounds=int(BCRYPT_ROUNDS))
+# bcrypt releases the GIL, so threads hash in parallel while the event loop keeps serving requests
+password_pool = BoundedPool(ThreadPoolExecutor(max_workers=PASSWORD_HASHING_WORKERS,
+                                               thread_name_prefix="password"),
+                            workers=PASSWORD_HASHING_WORKERS,
+                            queue_limit=PASSWORD_HASHING_QUEUE_LIMIT,
+                            retry_after=PASSWORD_HASHING_RETRY_AFTER_SECONDS)
+# Tokens whose signature was already checked, mapped to (user_id, exp)
+verified_token_cache = TTLCache(maxsize=VERIFIED_TOKEN_CACHE_MAX_ENTRIES,
+                                ttl=VERIFIED_TOKEN_CACHE_TTL_SECONDS)
 
 
 async def get_decoded_sub_from_base64(encoded_token: str) -> int | None:
@@ -28,6 +39,30 @@ async def get_decoded_sub_from_base64(encoded_token: str) -> int | None:
     return user_id
 
 
+async def get_user_id_from_token(token: str) -> int:
+    """Get user id from jwt token, checking signature only the first time the token is seen
+
+    Expiration is still checked on every call.
+    """
+    if not isinstance(token, str):
+        raise UnauthorizedException()
+    verified: tuple[int, float] | None = verified_token_cache.get(token)
+    if verified is None:
+        payload = await verify_token(token)
+        sub_base64 = payload.get("sub")
+        if sub_base64 is None:
+            raise UnauthorizedException()
+        user_id: int | None = await get_decoded_sub_from_base64(sub_base64)
+        if not user_id:
+            raise UnauthorizedException()
+        verified = (user_id, payload.get("exp", float("inf")))
+        verified_token_cache.set(token, verified)
+    user_id, expires_at = verified
+    if expires_at <= time.time():
+        raise TokenExpiredException()
+    return user_id
+
+
 async def create_auth_token(user_id: int) -> str:
     """Create authentication jwt token for a specific user
 
@@ -53,9 +88,23 @@ async def get_password_hash(password: str) -> str:
 
     Returns:
         string value as password hash
+
+    Raises:
+        ServiceBusyException: when too many passwords already wait to be hashed
     """
-    return bcrypt_context.hash(password)
+    return await password_pool.run(bcrypt_context.hash, password)
 
 
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt_context.verify(plain_password, hashed_password)
+    return await password_pool.run(bcrypt_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(plain_password: str,
+                                     hashed_password: str) -> tuple[bool, str | None]:
+    """Verify password and rehash it when its hash doesn't match current bcrypt policy
+
+    Returns:
+        whether password matches, and new hash to store or None if the current one is fine
+    """
+    return await password_pool.run(bcrypt_context.verify_and_update, plain_password,
+                                   hashed_password)
@@ -1,23 +1,35 @@
-import os
+import base64
+import json
 from datetime import datetime
-from pathlib import Path
 
-from core.constants import MEDIA_ROOT
+from guides.exceptions import InvalidCursorException
 
 
-def create_upload_path(directory: str, filename: str):
-    if not os.path.exists(directory):
-        Path(directory).mkdir(parents=True, exist_ok=True)
-    if not os.path.exists(directory + filename):
-        filename_parts = filename.split(".")
-        timestamp = str(int(datetime.now().timestamp()))
-        filename = "".join(filename_parts[:-1]) + "_" + timestamp + "." + filename_parts[-1]
-    open(f'{directory}{filename}', 'wb').close()
-    return directory + filename
+def encode_guides_cursor(position: datetime | float, guide_id: int) -> str:
+    """Encode position of the last guide on a page into an opaque cursor
 
+    Args:
+        position (datetime | float): last_modified value of the last returned guide, or its rank
+            when guides are searched
+        guide_id (int): id of the last returned guide
 
-def get_featured_image_upload_path(guide_id: str, filename: str):
-    directory = f"{MEDIA_ROOT}/guides/{guide_id}/cover_image/"
-    path = create_upload_path(directory, filename)
-    path_to_save = 'media' + path.split('media')[1]
-    return path_to_save
+    Returns:
+        url safe cursor string
+    """
+    if isinstance(position, datetime):
+        position = position.isoformat()
+    payload = json.dumps([position, guide_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('utf-8')
+
+
+def decode_guides_cursor(cursor: str) -> tuple[datetime | float, int]:
+    """Decode cursor created by encode_guides_cursor back into (position, guide_id)"""
+    try:
+        position, guide_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        if isinstance(position, str):
+            position = datetime.fromisoformat(position)
+        else:
+            position = float(position)
+        return position, int(guide_id)
+    except (ValueError, TypeError):
+        raise InvalidCursorException()
@@ -0,0 +1,72 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request, Response, status
+
+
+@dataclass(frozen=True)
+class SerializedResponse:
+    """JSON response body with its validators, ready to be cached and sent as is"""
+    content: bytes
+    etag: str
+    last_modified: datetime | None = None
+
+    def __len__(self) -> int:
+        # Size in bytes, used by byte budgeted caches
+        return len(self.content)
+
+
+def make_etag(*parts: Any) -> str:
+    """Make strong ETag from everything the representation is built from"""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    """Check request validators, If-None-Match takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have a precision of seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc),
+                                                   usegmt=True)
+    return headers
+
+
+def not_modified_response(etag: str, last_modified: datetime | None = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=validator_headers(etag, last_modified))
+
+
+def conditional_response(request: Request, response: SerializedResponse) -> Response:
+    """Send serialized response, or 304 Not Modified when the client already has it"""
+    if is_not_modified(request, response.etag, response.last_modified):
+        return not_modified_response(response.etag, response.last_modified)
+    return Response(content=response.content, media_type="application/json",
+                    headers=validator_headers(response.etag, response.last_modified))
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from core.constants import BASE_DIR
+from core.exceptions import InvalidImageException
+from core.settings import IMAGE_WORKERS, IMAGE_QUEUE_LIMIT, IMAGE_VARIANT_SIZES, \
+    IMAGE_VARIANT_QUALITY, IMAGE_FORMAT_EXTENSIONS
+from core.workers import BoundedPool
+
+# Resizing and encoding hold the GIL for most of the work, so they run in separate processes.
+# Forking the threaded server process could copy a lock held by another thread, so workers are
+# started from a fork server instead
+image_pool = BoundedPool(ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                             mp_context=multiprocessing.get_context("forkserver")),
+                         workers=IMAGE_WORKERS,
+                         queue_limit=IMAGE_QUEUE_LIMIT)
+# Pillow raises SyntaxError and ValueError on truncated or malformed files too
+INVALID_IMAGE_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+
+def get_file_path(path: str) -> str:
+    """Get filesystem path of media path
+
+    Media paths are stored relative to BASE_DIR, so they double as URL paths of the files, and
+    don't depend on the working directory of the process.
+    """
+    return os.path.join(BASE_DIR, path)
+
+
+def get_image_extension(path: str) -> str:
+    """Get extension of image from the format Pillow detects in it, not from its name"""
+    with Image.open(get_file_path(path)) as image:
+        return IMAGE_FORMAT_EXTENSIONS.get(image.format, f".{image.format.lower()}")
+
+
+def make_image_variants(path: str) -> dict[str, dict[str, str]]:
+    """Save resized copies of image at path next to it, in WebP and in JPEG or PNG as fallback
+
+    Returns paths of the copies by variant name, shaped like ImageVariantsSchema.
+    """
+    stem, _ = os.path.splitext(path)
+    variants: dict[str, dict[str, str]] = {}
+    try:
+        with Image.open(get_file_path(path)) as image:
+            image = ImageOps.exif_transpose(image)
+            has_alpha: bool = image.mode in ("RGBA", "LA", "PA") or \
+                (image.mode == "P" and "transparency" in image.info)
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            fallback_format, fallback_extension = ("PNG", "png") if has_alpha else ("JPEG", "jpg")
+            for name, size in IMAGE_VARIANT_SIZES.items():
+                variant = image.copy()
+                variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+                variants[name] = {"webp": f"{stem}_{name}.webp",
+                                  "fallback": f"{stem}_{name}.{fallback_extension}"}
+                variant.save(get_file_path(variants[name]["webp"]), "WEBP",
+                             quality=IMAGE_VARIANT_QUALITY)
+                variant.save(get_file_path(variants[name]["fallback"]), fallback_format,
+                             quality=IMAGE_VARIANT_QUALITY, optimize=True)
+    except BaseException:
+        remove_image(None, variants)
+        raise
+    return variants
+
+
+async def detect_image_extension(path: str) -> str:
+    """Get extension of uploaded image, raise InvalidImageException when it isn't an image"""
+    try:
+        return await image_pool.run(get_image_extension, path)
+    except INVALID_IMAGE_ERRORS:
+        raise InvalidImageException()
+
+
+async def create_image_variants(path: str) -> dict[str, dict[str, str]]:
+    """Make variants of uploaded image, raise InvalidImageException when it isn't a valid image
+
+    Image itself is left in place, removing it is up to the caller.
+    """
+    try:
+        return await image_pool.run(make_image_variants, path)
+    except INVALID_IMAGE_ERRORS:
+        raise InvalidImageException()
+
+
+def remove_image(path: str | None, variants: dict[str, dict[str, str]] | None) -> None:
+    """Remove image and all its variants"""
+    paths = [path] + [variant_path for variant in (variants or {}).values()
+                      for variant_path in variant.values()]
+    for image_path in filter(None, paths):
+        file_path: str = get_file_path(image_path)
+        if os.path.exists(file_path):
+            os.remove(file_path)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Sequence
+
+import aiosmtplib
+
+from utils.mail.send_mail import compose_message, mail_templates
+from utils.mail.smtp import SMTPPool
+
+
+@dataclass
+class BulkMailStats:
+    sent: int = 0
+    # Recipients refused by the server
+    skipped: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def per_second(self) -> float:
+        elapsed: float = time.monotonic() - self.started_at
+        return self.sent / elapsed if elapsed else 0.0
+
+
+class MailCheckpoint:
+    """Id of the last recipient whose batch was fully sent, kept in a json file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path) as f:
+            return json.load(f)["last_recipient_id"]
+
+    def save(self, last_recipient_id: int) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_recipient_id": last_recipient_id}, f)
+        os.replace(tmp_path, self.path)
+
+
+class SendPacer:
+    """Spaces sends evenly so that at most `rate` messages are sent per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next_at = 0.0
+
+    async def wait(self) -> None:
+        now: float = time.monotonic()
+        send_at: float = max(now, self._next_at)
+        self._next_at = send_at + self.interval
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+
+
+async def send_bulk_mail(recipients: AsyncIterator[Sequence[Any]], subject: str,
+                         template_name: str, body_for: Callable[[Any], Dict[str, Any]],
+                         pool: SMTPPool, rate: float,
+                         checkpoint: MailCheckpoint) -> BulkMailStats:
+    """Send templated email to batches of (id, email, ...) recipients ordered by id
+
+    Template is compiled once and messages are sent concurrently over the pool's connections.
+    Checkpoint is saved after every fully sent batch, so when sending fails the job can be run
+    again and continues after the last saved batch, sending at most one batch twice.
+    """
+    template = mail_templates.get_template(template_name)
+    pacer = SendPacer(rate)
+    stats = BulkMailStats()
+
+    async def send(recipient) -> None:
+        await pacer.wait()
+        await pool.send_message(compose_message(subject, [recipient.email],
+                                                template.render(**body_for(recipient))))
+
+    async for batch in recipients:
+        results = await asyncio.gather(*(send(recipient) for recipient in batch),
+                                       return_exceptions=True)
+        for recipient, result in zip(batch, results):
+            if isinstance(result, aiosmtplib.SMTPRecipientsRefused):
+                stats.skipped += 1
+                logging.warning(f"Recipient {recipient.email} refused: {result}")
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                stats.sent += 1
+        checkpoint.save(batch[-1][0])
+        logging.info(f"Sent {stats.sent} emails, {stats.per_second:.1f} per second")
+    return stats
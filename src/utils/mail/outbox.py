@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dependencies import DBSession
+from core.models import EmailOutbox
+from core.settings import MAIL_OUTBOX_BATCH_SIZE, MAIL_OUTBOX_POLL_SECONDS, \
+    MAIL_OUTBOX_MAX_ATTEMPTS, MAIL_OUTBOX_RETRY_BASE_SECONDS, MAIL_OUTBOX_RETRY_MAX_SECONDS, \
+    MAIL_OUTBOX_LEASE_SECONDS
+from utils.mail.send_mail import build_message, smtp_pool
+
+
+@dataclass
+class OutboxStats:
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    # Pending emails, as of the last delivered batch
+    depth: int = 0
+
+
+outbox_stats = OutboxStats()
+# Set when this process queues mail, so workers don't wait for the next poll
+outbox_event = asyncio.Event()
+
+
+async def queue_mail(db: AsyncSession, subject: str, recipients: list[str],
+                     body: Dict[str, Any], template_name: str) -> EmailOutbox:
+    """Add email to the outbox, it's saved and later sent only if the caller commits"""
+    email = EmailOutbox(subject=subject, recipients=recipients, body=body,
+                        template_name=template_name, attempts=0)
+    db.add(email)
+    return email
+
+
+def notify_outbox() -> None:
+    """Wake up delivery workers, call after committing queued mail"""
+    outbox_event.set()
+
+
+def pending_emails():
+    return select(EmailOutbox).filter(EmailOutbox.sent_at.is_(None),
+                                      EmailOutbox.failed_at.is_(None))
+
+
+async def get_outbox_depth(db: AsyncSession) -> int:
+    return await db.scalar(select(func.count()).select_from(pending_emails().subquery()))
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(MAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+                                 MAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+async def claim_outbox_batch(db: AsyncSession) -> list[EmailOutbox]:
+    """Claim a batch of due emails for this worker and commit the claim
+
+    Rows are locked only while claiming, other workers skip them. Claimed emails count as an
+    attempt and aren't due again until the lease runs out, so if the worker dies while sending,
+    they are retried by another one.
+    """
+    result = await db.execute(pending_emails()
+                              .filter(EmailOutbox.next_attempt_at <= func.now())
+                              .order_by(EmailOutbox.next_attempt_at)
+                              .limit(MAIL_OUTBOX_BATCH_SIZE)
+                              .with_for_update(skip_locked=True))
+    emails: list[EmailOutbox] = result.scalars().all()
+    lease_ends_at = datetime.now(timezone.utc) + timedelta(seconds=MAIL_OUTBOX_LEASE_SECONDS)
+    for email in emails:
+        email.attempts += 1
+        email.next_attempt_at = lease_ends_at
+    await db.commit()
+    return emails
+
+
+async def deliver_outbox_batch(db: AsyncSession) -> int:
+    """Send a batch of due emails and return how many were taken
+
+    Emails are claimed first and sent outside of any transaction, so no rows stay locked while
+    waiting for the SMTP server. Result of every email is committed right after sending it.
+    """
+    emails: list[EmailOutbox] = await claim_outbox_batch(db)
+    for email in emails:
+        try:
+            await smtp_pool.send_message(build_message(email.subject, email.recipients,
+                                                       email.body, email.template_name))
+        except Exception as e:
+            now = datetime.now(timezone.utc)
+            email.last_error = str(e)
+            if email.attempts >= MAIL_OUTBOX_MAX_ATTEMPTS:
+                email.failed_at = now
+                outbox_stats.failed += 1
+                logging.error(f"Sending email {email.email_outbox_id} failed, giving up: {e}")
+            else:
+                email.next_attempt_at = now + get_retry_delay(email.attempts)
+                outbox_stats.retried += 1
+                logging.warning(f"Sending email {email.email_outbox_id} failed, retrying: {e}")
+        else:
+            email.sent_at = datetime.now(timezone.utc)
+            outbox_stats.sent += 1
+        await db.commit()
+    if emails:
+        outbox_stats.depth = await get_outbox_depth(db)
+        logging.info(f"Email outbox depth: {outbox_stats.depth}")
+    return len(emails)
+
+
+async def run_outbox_worker() -> None:
+    """Deliver emails from the outbox until cancelled"""
+    while True:
+        taken: int = 0
+        try:
+            async with DBSession() as db:
+                taken = await deliver_outbox_batch(db)
+        except Exception as e:
+            logging.error(f"Delivering email outbox failed: {str(e)}")
+        if taken < MAIL_OUTBOX_BATCH_SIZE:
+            outbox_event.clear()
+            try:
+                await asyncio.wait_for(outbox_event.wait(), timeout=MAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
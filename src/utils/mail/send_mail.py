@@ -1,13 +1,16 @@
 import logging
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 from typing import Dict, Any
 
 from fastapi import HTTPException, status
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
 
-from core.settings import DEFAULT_FROM_EMAIL
+from core.settings import DEFAULT_FROM_EMAIL, MAIL_SMTP_POOL_SIZE
 from src import config
+from utils.mail.smtp import SMTPPool
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -22,19 +25,32 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent.parent.parent / 'templates/mail/',
     SUPPRESS_SEND=config.SUPPRESS_SEND if config.SUPPRESS_SEND else 0,
 )
+mail_templates = conf.template_engine()
+smtp_pool = SMTPPool(conf, size=MAIL_SMTP_POOL_SIZE)
+
+
+def compose_message(subject: str, recipients: list[str], html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = formataddr((conf.MAIL_FROM_NAME, str(conf.MAIL_FROM))) \
+        if conf.MAIL_FROM_NAME else str(conf.MAIL_FROM)
+    message["To"] = ", ".join(recipients)
+    message.set_content(html, subtype="html")
+    return message
+
+
+def build_message(subject: str, recipients: list[str], body: Dict[str, Any],
+                  template_name: str) -> EmailMessage:
+    """Render html template into a message ready to be sent over SMTP"""
+    return compose_message(subject, recipients,
+                           mail_templates.get_template(template_name).render(**body))
 
 
 async def send_mail(subject: str, recipients: list[EmailStr], body: Dict[str, Any],
                     template_name: str) -> None:
-    message = MessageSchema(
-        subject=subject,
-        recipients=recipients,
-        template_body=body,
-        subtype=MessageType.html,
-    )
     try:
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name=template_name)
+        await smtp_pool.send_message(build_message(subject, [str(r) for r in recipients], body,
+                                                   template_name))
         logging.info("Email sent successfully")
     except Exception as e:
         logging.error(f"Sending email failed: {str(e)}")
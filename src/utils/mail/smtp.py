@@ -0,0 +1,59 @@
+import asyncio
+from email.message import EmailMessage
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+
+
+class SMTPPool:
+    """Keeps up to `size` authenticated SMTP connections open and reuses them between messages"""
+
+    def __init__(self, settings: ConnectionConfig, size: int):
+        self.settings = settings
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[aiosmtplib.SMTP] = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(hostname=self.settings.MAIL_SERVER,
+                               port=self.settings.MAIL_PORT,
+                               timeout=self.settings.TIMEOUT,
+                               use_tls=self.settings.MAIL_SSL_TLS,
+                               start_tls=self.settings.MAIL_STARTTLS,
+                               validate_certs=self.settings.VALIDATE_CERTS)
+        await smtp.connect()
+        if self.settings.USE_CREDENTIALS:
+            await smtp.login(self.settings.MAIL_USERNAME, self.settings.MAIL_PASSWORD)
+        return smtp
+
+    async def _take(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:
+                return smtp
+        return await self._connect()
+
+    async def send_message(self, message: EmailMessage) -> None:
+        """Send message over a pooled connection, reconnecting once if the server dropped it"""
+        if self.settings.SUPPRESS_SEND:
+            return
+        async with self._slots:
+            smtp = await self._take()
+            try:
+                try:
+                    await smtp.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    smtp.close()
+                    smtp = await self._connect()
+                    await smtp.send_message(message)
+            except Exception:
+                smtp.close()
+                raise
+            self._idle.append(smtp)
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
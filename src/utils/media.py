@@ -0,0 +1,147 @@
+import asyncio
+import os
+
+from fastapi import UploadFile
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+from core.constants import BASE_DIR, MEDIA_OBJECTS_ROOT
+from core.dependencies import DBSession
+from core.exceptions import InvalidImageException
+from core.models import MediaObject
+from utils.images import create_image_variants, detect_image_extension, get_file_path, \
+    remove_image
+from utils.uploads import receive_upload
+
+# Session info key of objects whose files were placed in the current, uncommitted transaction
+PLACED_MEDIA_KEY = "placed_media"
+# Removals of files placed by rolled back transactions, kept so they aren't garbage collected
+media_cleanup_tasks: set[asyncio.Task] = set()
+
+
+def get_media_path(digest: str, extension: str) -> str:
+    """Path of stored object, sharded by the start of its digest so no directory grows too large"""
+    path = os.path.join(MEDIA_OBJECTS_ROOT, digest[:2], digest[2:4], f"{digest}{extension}")
+    return os.path.relpath(path, BASE_DIR)
+
+
+async def add_media_reference(db: AsyncSession, digest: str, path: str,
+                              size: int) -> MediaObject:
+    """Count a new reference to object with given digest, creating it when it's not stored yet
+
+    Row of the object stays locked until the transaction ends.
+    """
+    await db.execute(insert(MediaObject)
+                     .values(digest=digest, path=path, size=size, ref_count=1)
+                     .on_conflict_do_update(index_elements=[MediaObject.digest],
+                                            set_={"ref_count": MediaObject.ref_count + 1}))
+    result = await db.execute(select(MediaObject)
+                              .filter(MediaObject.digest == digest)
+                              .execution_options(populate_existing=True))
+    return result.scalar_one()
+
+
+def place_media_file(db: AsyncSession, media: MediaObject, tmp_path: str) -> bool:
+    """Move file to path of object unless it's stored already, return True when it was moved
+
+    Must be called after adding a reference, while the row of the object is locked, so its files
+    can't be removed meanwhile. Placed file is removed again when the transaction isn't committed.
+    """
+    file_path: str = get_file_path(media.path)
+    if os.path.exists(file_path):
+        return False
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    os.replace(tmp_path, file_path)
+    db.sync_session.info.setdefault(PLACED_MEDIA_KEY, []).append(media)
+    return True
+
+
+async def store_media(db: AsyncSession, file: UploadFile) -> MediaObject:
+    """Store uploaded image under its content hash, with its variants, and add a reference to it
+
+    Identical uploads are stored and resized only once. The reference is counted in the caller's
+    transaction, so it must be committed together with the column pointing to the object.
+    """
+    tmp_path, size, digest = await receive_upload(file)
+    try:
+        # Name of the file is up to the client, so the extension comes from its content
+        extension: str = await detect_image_extension(tmp_path)
+        media = await add_media_reference(db, digest, get_media_path(digest, extension), size)
+        placed: bool = place_media_file(db, media, tmp_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if media.variants is None:
+        try:
+            media.variants = await create_image_variants(media.path)
+        except InvalidImageException:
+            # Existing object may be referenced by committed rows, only a new file is removed
+            if placed:
+                db.sync_session.info[PLACED_MEDIA_KEY].remove(media)
+                remove_image(media.path, None)
+            raise
+    return media
+
+
+async def release_media(db: AsyncSession, path: str | None) -> bool:
+    """Drop a reference to stored object, return True when its files should be removed
+
+    Unreferenced object keeps its row, files are removed by remove_media after the transaction
+    is committed. Files stored before content addressing aren't counted and always had a single
+    reference.
+    """
+    if path is None:
+        return False
+    result = await db.execute(select(MediaObject)
+                              .filter(MediaObject.path == path)
+                              .with_for_update()
+                              .execution_options(populate_existing=True))
+    media: MediaObject | None = result.scalar_one_or_none()
+    if media is None:
+        return True
+    media.ref_count -= 1
+    return media.ref_count == 0
+
+
+async def remove_media(path: str, variants: dict[str, dict[str, str]] | None) -> None:
+    """Remove files of object released by a committed transaction, unless it's referenced again
+
+    Row of the object is deleted and stays locked while the files are removed, so an upload of the
+    same content waits for it and then stores the files again. Placeholder row is inserted first,
+    so the same holds for files of a transaction which was rolled back.
+    """
+    objects_root: str = os.path.relpath(MEDIA_OBJECTS_ROOT, BASE_DIR)
+    if os.path.commonpath([path, objects_root]) != objects_root:
+        remove_image(path, variants)
+        return
+    digest: str = os.path.splitext(os.path.basename(path))[0]
+    async with DBSession() as db:
+        await db.execute(insert(MediaObject)
+                         .values(digest=digest, path=path, size=0, ref_count=0)
+                         .on_conflict_do_nothing(index_elements=[MediaObject.digest]))
+        result = await db.execute(delete(MediaObject)
+                                  .filter(MediaObject.digest == digest,
+                                          MediaObject.ref_count == 0)
+                                  .returning(MediaObject.variants))
+        removed = result.one_or_none()
+        if removed is not None:
+            remove_image(path, variants or removed.variants)
+        await db.commit()
+
+
+@event.listens_for(Session, "after_commit")
+def forget_placed_media(session: Session) -> None:
+    session.info.pop(PLACED_MEDIA_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def remove_rolled_back_media(session: Session, transaction: SessionTransaction) -> None:
+    """Remove files placed by a transaction which ended without commit"""
+    if transaction.parent is not None:
+        return
+    for media in session.info.pop(PLACED_MEDIA_KEY, None) or ():
+        task = asyncio.get_running_loop().create_task(remove_media(media.path, media.variants))
+        media_cleanup_tasks.add(task)
+        task.add_done_callback(media_cleanup_tasks.discard)
@@ -0,0 +1,194 @@
+import os
+from datetime import datetime, timezone
+from mimetypes import guess_type
+from os import PathLike
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request, status
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from core.constants import MEDIA_OBJECTS_ROOT, MEDIA_ROOT, MEDIA_TMP_ROOT
+from core.settings import MEDIA_CACHE_CONTROL, MEDIA_IMMUTABLE_CACHE_CONTROL, MEDIA_CHUNK_BYTES
+from src.config import MEDIA_ACCEL_REDIRECT_PREFIX
+from utils.http import is_not_modified, validator_headers
+
+# Content-Encoding of precompressed copies looked up next to a file, by their extension
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Only these are worth compressing, images already are
+COMPRESSIBLE_MEDIA_TYPES = ("text/", "application/json", "application/javascript",
+                            "image/svg+xml")
+
+
+class RangeNotSatisfiableError(Exception):
+    pass
+
+
+def parse_byte_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Get first and last byte of a single range from Range header
+
+    Returns None when the whole file should be sent, because there's no range, the header is
+    malformed or it asks for multiple ranges. Raises RangeNotSatisfiableError when the range
+    starts past the end of the file.
+    """
+    if not header:
+        return None
+    unit, _, byte_range = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    first, separator, last = byte_range.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if first:
+            start: int = int(first)
+            end: int = size - 1
+            if last:
+                if int(last) < start:
+                    return None
+                end = min(int(last), end)
+        else:
+            # Suffix range, the last N bytes
+            suffix_length: int = int(last)
+            if suffix_length <= 0:
+                raise RangeNotSatisfiableError()
+            start, end = max(size - suffix_length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError()
+    return start, end
+
+
+def find_precompressed(path: str, accept_encoding: str) -> tuple[str, os.stat_result, str] | None:
+    """Find precompressed copy of file the client accepts, with its stat and encoding"""
+    accepted = {encoding.split(";")[0].strip() for encoding in accept_encoding.split(",")}
+    for encoding, extension in PRECOMPRESSED_ENCODINGS:
+        if encoding in accepted:
+            try:
+                return path + extension, os.stat(path + extension), encoding
+            except FileNotFoundError:
+                continue
+    return None
+
+
+class MediaFileResponse(Response):
+    """Sends file with validators and caching headers, honouring conditional and range requests
+
+    Body is handed to the server with the ASGI zero-copy extension when the server supports it,
+    otherwise it's read in chunks off the event loop. With `accel_redirect_prefix`, no body is
+    sent at all and the front proxy is told to serve the file from that internal location.
+    """
+
+    def __init__(self, path: str, stat_result: os.stat_result, cache_control: str,
+                 accel_redirect_prefix: str | None = None):
+        super().__init__(media_type=guess_type(path)[0] or "application/octet-stream")
+        self.path = path
+        self.stat_result = stat_result
+        self.cache_control = cache_control
+        self.accel_redirect_prefix = accel_redirect_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope)
+        path, stat_result, encoding = self.path, self.stat_result, None
+        self.headers["Cache-Control"] = self.cache_control
+        if self.accel_redirect_prefix:
+            relative_path: str = os.path.relpath(path, os.path.realpath(MEDIA_ROOT)) \
+                .replace(os.sep, "/")
+            # Proxy decodes the URI, and header values can't carry every character of a filename
+            self.headers["X-Accel-Redirect"] = \
+                f"{self.accel_redirect_prefix}{quote(relative_path)}"
+            await self.send_headers(send, status.HTTP_200_OK)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if self.media_type.startswith(COMPRESSIBLE_MEDIA_TYPES):
+            self.headers["Vary"] = "Accept-Encoding"
+            precompressed = await anyio.to_thread.run_sync(
+                find_precompressed, path, request.headers.get("accept-encoding", ""))
+            if precompressed is not None:
+                path, stat_result, encoding = precompressed
+                self.headers["Content-Encoding"] = encoding
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}' \
+               f'{"-" + encoding if encoding else ""}"'
+        last_modified = datetime.fromtimestamp(stat_result.st_mtime, timezone.utc)
+        self.headers.update(validator_headers(etag, last_modified))
+        self.headers["Accept-Ranges"] = "bytes"
+        if is_not_modified(request, etag, last_modified):
+            await self.send_headers(send, status.HTTP_304_NOT_MODIFIED)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        size: int = stat_result.st_size
+        if_range: str | None = request.headers.get("if-range")
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), size) \
+                if if_range is None or if_range == etag else None
+        except RangeNotSatisfiableError:
+            self.headers["Content-Range"] = f"bytes */{size}"
+            self.headers["Content-Length"] = "0"
+            await self.send_headers(send, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            await send({"type": "http.response.body", "body": b""})
+            return
+        start, end = byte_range or (0, size - 1)
+        self.headers["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            self.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        await self.send_headers(send, status.HTTP_206_PARTIAL_CONTENT if byte_range
+                                else status.HTTP_200_OK)
+        if request.method == "HEAD" or size == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await self.send_file(scope, send, path, start, end - start + 1)
+
+    async def send_headers(self, send: Send, status_code: int) -> None:
+        if status_code == status.HTTP_304_NOT_MODIFIED:
+            del self.headers["Content-Length"]
+        await send({"type": "http.response.start", "status": status_code,
+                    "headers": self.raw_headers})
+
+    async def send_file(self, scope: Scope, send: Send, path: str, offset: int,
+                        count: int) -> None:
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(path, "rb") as file:
+                await send({"type": "http.response.zerocopy", "file": file, "offset": offset,
+                            "count": count, "more_body": False})
+            return
+        async with await anyio.open_file(path, mode="rb") as file:
+            await file.seek(offset)
+            while count > 0:
+                chunk: bytes = await file.read(min(MEDIA_CHUNK_BYTES, count))
+                if not chunk:
+                    break
+                count -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk,
+                            "more_body": count > 0})
+        if count > 0:
+            # File was truncated while being sent, close the response anyway
+            await send({"type": "http.response.body", "body": b""})
+
+
+class MediaFiles(StaticFiles):
+    """Static files of media root, served by MediaFileResponse
+
+    Stored objects never change, a different content gets a different path, so clients may cache
+    them forever.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.split(os.sep)[0] == os.path.basename(MEDIA_TMP_ROOT):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path: PathLike, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        full_path = os.path.realpath(full_path)
+        objects_root: str = os.path.realpath(MEDIA_OBJECTS_ROOT)
+        is_object: bool = os.path.commonpath([full_path, objects_root]) == objects_root
+        return MediaFileResponse(full_path, stat_result,
+                                 MEDIA_IMMUTABLE_CACHE_CONTROL if is_object
+                                 else MEDIA_CACHE_CONTROL,
+                                 accel_redirect_prefix=MEDIA_ACCEL_REDIRECT_PREFIX)
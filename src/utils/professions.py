@@ -0,0 +1,56 @@
+from bisect import bisect_left
+
+from users.schemas import ProfessionReadSchema
+
+
+class ProfessionIndex:
+    """Process local autocomplete index over the profession codebook
+
+    Matches are ranked: names starting with the search first, then names with a word starting
+    with it, then names containing it anywhere. Ties are ordered alphabetically.
+    """
+
+    def __init__(self):
+        self.loaded: bool = False
+        self._by_id: dict[int, ProfessionReadSchema] = {}
+        # Sorted (lowercase suffix, rank, profession_id) for every suffix of every name, names
+        # containing a term are then the suffixes starting with it, found by bisection
+        self._suffixes: list[tuple[str, int, int]] = []
+
+    def load(self, professions: list[ProfessionReadSchema]) -> None:
+        by_id = {profession.profession_id: profession for profession in professions}
+        suffixes = sorted((lowercase_name[offset:], get_match_rank(lowercase_name, offset),
+                           profession.profession_id)
+                          for profession in professions
+                          for lowercase_name in (profession.name.lower(),)
+                          for offset in range(len(lowercase_name))
+                          if not lowercase_name[offset].isspace())
+        # Swap whole index at once, so concurrent searches never see it half built
+        self._by_id, self._suffixes = by_id, suffixes
+        self.loaded = True
+
+    def get(self, profession_id: int) -> ProfessionReadSchema | None:
+        return self._by_id.get(profession_id)
+
+    def search(self, name: str) -> list[ProfessionReadSchema]:
+        term = name.strip().lower()
+        if not term:
+            return sorted(self._by_id.values(), key=lambda profession: profession.name)
+        ranks: dict[int, int] = {}
+        start = bisect_left(self._suffixes, (term,))
+        for suffix, rank, profession_id in self._suffixes[start:]:
+            if not suffix.startswith(term):
+                break
+            ranks[profession_id] = min(rank, ranks.get(profession_id, rank))
+        return sorted((self._by_id[profession_id] for profession_id in ranks),
+                      key=lambda profession: (ranks[profession.profession_id], profession.name))
+
+
+def get_match_rank(lowercase_name: str, offset: int) -> int:
+    """Rank of a match at offset: start of the name, start of its word, or inside a word"""
+    if offset == 0:
+        return 0
+    return 1 if lowercase_name[offset - 1].isspace() else 2
+
+
+profession_index = ProfessionIndex()
@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from fastapi import UploadFile
+
+from core.constants import MEDIA_TMP_ROOT
+from core.exceptions import FileTooLargeException
+from core.settings import UPLOAD_MAX_BYTES, UPLOAD_CHUNK_BYTES, UPLOAD_WORKERS, \
+    UPLOAD_QUEUE_LIMIT
+from core.workers import BoundedPool
+
+
+@dataclass
+class UploadStats:
+    saved: int = 0
+    # Uploads over the size limit
+    rejected: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+upload_stats = UploadStats()
+# Files are copied in threads, so writing a large upload doesn't block the event loop
+upload_pool = BoundedPool(ThreadPoolExecutor(max_workers=UPLOAD_WORKERS,
+                                             thread_name_prefix="upload"),
+                          workers=UPLOAD_WORKERS,
+                          queue_limit=UPLOAD_QUEUE_LIMIT)
+
+
+def write_upload(source: BinaryIO, path: str, max_bytes: int) -> tuple[int, str]:
+    """Copy source to a new file at path in chunks, return its size and sha256 hex digest
+
+    Copying stops as soon as source is larger than `max_bytes`, and the partial file is removed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "xb") as destination:
+            while chunk := source.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeException(max_bytes)
+                digest.update(chunk)
+                destination.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return size, digest.hexdigest()
+
+
+async def receive_upload(file: UploadFile,
+                         max_bytes: int = UPLOAD_MAX_BYTES) -> tuple[str, int, str]:
+    """Save uploaded file to a temporary path without blocking the event loop
+
+    Returns the path together with size and sha256 hex digest of the file. Temporary files are
+    on the same filesystem as media, so they can be renamed into place atomically.
+    """
+    os.makedirs(MEDIA_TMP_ROOT, exist_ok=True)
+    path = os.path.join(MEDIA_TMP_ROOT, f"{uuid.uuid4().hex}.part")
+    started_at: float = time.perf_counter()
+    try:
+        size, digest = await upload_pool.run(write_upload, file.file, path, max_bytes)
+    except FileTooLargeException:
+        upload_stats.rejected += 1
+        raise
+    finally:
+        await file.close()
+    elapsed: float = time.perf_counter() - started_at
+    upload_stats.saved += 1
+    upload_stats.bytes += size
+    upload_stats.seconds += elapsed
+    logging.info(f"Saved upload of {size} bytes in {elapsed:.3f} s, "
+                 f"{upload_stats.bytes_per_second / (1024 * 1024):.1f} MB/s on average")
+    return path, size, digest
@@ -0,0 +1,39 @@
+import os
+import time
+
+import pytest
+
+# Read by src/config.py on import, tests never connect to the database
+TEST_ENVIRONMENT = {
+    "SECRET_KEY": "test-secret-key",
+    "ALGORITHM": "HS256",
+    "TOKEN_EXP_MINUTES": "30",
+    "DB_USER": "guidio",
+    "DB_PASS": "guidio",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "guidio_test",
+}
+for name, value in TEST_ENVIRONMENT.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """time.monotonic which moves only when a test moves it, read by caches and rate limits"""
+    fake_clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake_clock)
+    return fake_clock
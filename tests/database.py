@@ -0,0 +1,70 @@
+"""Seeded PostgreSQL database shared by query tests and benchmarks
+
+Tables of the database in TEST_DATABASE_URL are dropped and created again, so it must be one
+used only by tests. Everything using it is skipped when it's not set.
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from core.models import Guide, Profession, User, UserDetail
+from src.database import Base
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+# Words guides are about, every guide has one of them in its title and content
+TOPICS = ("python", "postgres", "docker", "kubernetes", "react", "rust", "golang", "terraform",
+          "graphql", "redis", "kafka", "nginx", "linux", "django", "fastapi", "typescript",
+          "swift", "kotlin", "flutter", "spark")
+GUIDES_BATCH_USERS = 100
+
+
+async def create_seeded_engine(users: int, guides_per_user: int) -> AsyncEngine:
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.begin() as connection:
+        await connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await seed(connection, users, guides_per_user)
+    async with engine.connect() as connection:
+        await connection.execute(text("ANALYZE"))
+    return engine
+
+
+async def seed(connection, users: int, guides_per_user: int) -> None:
+    """Users with details, every other one an instructor, and their guides, mostly published"""
+    await connection.execute(insert(Profession), [{"profession_id": 1, "name": "Data Engineer"},
+                                                  {"profession_id": 2, "name": "Designer"}])
+    await connection.execute(insert(User), [
+        {"user_id": user_id, "first_name": f"First{user_id}", "last_name": f"Last{user_id}",
+         "email": f"user{user_id}@example.com", "password": "hash", "is_active": True}
+        for user_id in range(1, users + 1)])
+    await connection.execute(insert(UserDetail), [
+        {"user_id": user_id, "is_instructor": user_id % 2 == 0, "profession_id": user_id % 2 + 1}
+        for user_id in range(1, users + 1)])
+    started_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for first_user_id in range(1, users + 1, GUIDES_BATCH_USERS):
+        await connection.execute(insert(Guide), [
+            {"title": f"Guide {user_id}.{number} {TOPICS[(user_id + number) % len(TOPICS)]}",
+             "content": f"Guide about {TOPICS[(user_id + number) % len(TOPICS)]} {number}",
+             "published": number % 5 != 0, "user_id": user_id,
+             "last_modified": started_at + timedelta(minutes=number * users + user_id)}
+            for user_id in range(first_user_id, min(first_user_id + GUIDES_BATCH_USERS, users + 1))
+            for number in range(guides_per_user)])
+
+
+@contextmanager
+def record_queries(engine: AsyncEngine) -> Iterator[list[tuple[str, tuple]]]:
+    queries: list[tuple[str, tuple]] = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        queries.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield queries
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
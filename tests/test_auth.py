@@ -0,0 +1,83 @@
+import base64
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from jose import jwt
+
+from auth.exceptions import TokenExpiredException, UnauthorizedException
+from src.config import ALGORITHM, SECRET_KEY
+from utils import auth
+from utils.auth import create_auth_token, get_user_id_from_token, verified_token_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    verified_token_cache.invalidate()
+
+
+@pytest.fixture
+def count_verifications(monkeypatch) -> list[str]:
+    verified: list[str] = []
+    verify_token = auth.verify_token
+
+    async def counting_verify_token(token: str) -> dict:
+        verified.append(token)
+        return await verify_token(token)
+
+    monkeypatch.setattr(auth, "verify_token", counting_verify_token)
+    return verified
+
+
+def encode_token(user_id: int, expires_in: timedelta) -> str:
+    sub = base64.b64encode(str(user_id).encode("utf-8")).decode("utf-8")
+    return jwt.encode({"sub": sub, "exp": datetime.now(timezone.utc) + expires_in}, SECRET_KEY,
+                      algorithm=ALGORITHM)
+
+
+async def test_cache_hit_skips_verification(count_verifications):
+    token = await create_auth_token(7)
+
+    assert await get_user_id_from_token(token) == 7
+    assert await get_user_id_from_token(token) == 7
+
+    assert count_verifications == [token]
+
+
+async def test_expired_token_is_rejected_on_cache_hit(monkeypatch, count_verifications):
+    token = encode_token(7, timedelta(minutes=1))
+    assert await get_user_id_from_token(token) == 7
+    now = time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now + 120)
+
+    with pytest.raises(TokenExpiredException):
+        await get_user_id_from_token(token)
+    assert count_verifications == [token]
+
+
+async def test_expired_token_is_rejected_and_not_cached():
+    token = encode_token(7, timedelta(minutes=-1))
+
+    with pytest.raises(TokenExpiredException):
+        await get_user_id_from_token(token)
+    assert verified_token_cache.get(token) is None
+
+
+async def test_token_with_wrong_signature_is_rejected():
+    token = jwt.encode({"sub": "Nw==", "exp": datetime.now(timezone.utc) + timedelta(minutes=1)},
+                       "another-key", algorithm=ALGORITHM)
+
+    with pytest.raises(UnauthorizedException):
+        await get_user_id_from_token(token)
+
+
+async def test_repeated_lookups_verify_every_token_once(count_verifications):
+    tokens = [await create_auth_token(user_id) for user_id in range(1, 51)]
+
+    for _ in range(3):
+        for user_id, token in enumerate(tokens, start=1):
+            assert await get_user_id_from_token(token) == user_id
+
+    assert count_verifications == tokens
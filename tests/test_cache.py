@@ -0,0 +1,96 @@
+from core.cache import TTLCache
+
+
+def test_entry_expires_after_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=30)
+    ttl_cache.set("key", "value")
+
+    clock.now += 29
+    assert ttl_cache.get("key") == "value"
+    clock.now += 2
+    assert ttl_cache.get("key") is None
+    assert len(ttl_cache) == 0
+    assert ttl_cache.stats()["hits"] == 1 and ttl_cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    ttl_cache = TTLCache(maxsize=2, ttl=30)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+
+    ttl_cache.set("c", 3)
+
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1 and ttl_cache.get("c") == 3
+    assert ttl_cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_until_values_fit(clock):
+    ttl_cache = TTLCache(maxsize=None, ttl=30, maxbytes=10)
+    ttl_cache.set("a", b"1234")
+    ttl_cache.set("b", b"1234")
+
+    ttl_cache.set("c", b"123456")
+
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("b") == b"1234" and ttl_cache.get("c") == b"123456"
+    assert ttl_cache.bytes == 10
+
+
+def test_value_over_byte_budget_is_not_stored(clock):
+    ttl_cache = TTLCache(maxsize=None, ttl=30, maxbytes=10)
+    ttl_cache.set("a", b"1234")
+
+    ttl_cache.set("b", b"12345678901")
+
+    assert ttl_cache.get("b") is None and ttl_cache.get("a") == b"1234"
+    assert ttl_cache.bytes == 4
+
+
+def test_replacing_value_updates_bytes(clock):
+    ttl_cache = TTLCache(maxsize=None, ttl=30, maxbytes=10)
+    ttl_cache.set("a", b"1234")
+
+    ttl_cache.set("a", b"12")
+
+    assert ttl_cache.bytes == 2
+
+
+def test_value_built_before_invalidation_is_not_stored(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=30)
+    generation = ttl_cache.generation
+
+    ttl_cache.invalidate_tags("guide:1")
+    ttl_cache.set("key", "stale", generation=generation)
+
+    assert ttl_cache.get("key") is None
+    ttl_cache.set("key", "fresh", generation=ttl_cache.generation)
+    assert ttl_cache.get("key") == "fresh"
+
+
+def test_invalidate_tags_drops_only_tagged_entries(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=30, maxbytes=100)
+    ttl_cache.set("guide", b"1", tags=("guide:1", "user:1"))
+    ttl_cache.set("list", b"22", tags=("list",))
+
+    ttl_cache.invalidate_tags("user:1")
+
+    assert ttl_cache.get("guide") is None and ttl_cache.get("list") == b"22"
+    assert ttl_cache.bytes == 2
+    ttl_cache.invalidate_tags("guide:1")
+    assert ttl_cache.get("list") == b"22"
+
+
+def test_invalidate_prefix(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=30)
+    ttl_cache.set("guides:1", 1)
+    ttl_cache.set("guides:2", 2)
+    ttl_cache.set("instructors", 3)
+
+    ttl_cache.invalidate("guides:")
+
+    assert ttl_cache.get("guides:1") is None and ttl_cache.get("guides:2") is None
+    assert ttl_cache.get("instructors") == 3
+    ttl_cache.invalidate()
+    assert len(ttl_cache) == 0
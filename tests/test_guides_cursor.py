@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from guides.exceptions import InvalidCursorException
+from utils.guides import decode_guides_cursor, encode_guides_cursor
+
+
+def test_cursor_with_last_modified_round_trips():
+    last_modified = datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_guides_cursor(last_modified, 42)
+
+    assert decode_guides_cursor(cursor) == (last_modified, 42)
+
+
+def test_cursor_with_search_rank_round_trips():
+    cursor = encode_guides_cursor(0.0759909, 7)
+
+    assert decode_guides_cursor(cursor) == (pytest.approx(0.0759909), 7)
+    assert isinstance(decode_guides_cursor(cursor)[0], float)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_guides_cursor(datetime(2024, 3, 1, tzinfo=timezone.utc), 2 ** 40)
+
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WzFd", "WyJ4IiwgMV0=", "WzEsICJ4Il0="])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorException):
+        decode_guides_cursor(cursor)
@@ -0,0 +1,48 @@
+import io
+
+import pytest
+from PIL import Image
+
+from utils import images
+from utils.images import INVALID_IMAGE_ERRORS, get_image_extension, remove_image
+
+
+def save_image(path, image_format: str) -> None:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(buffer, image_format)
+    path.write_bytes(buffer.getvalue())
+
+
+@pytest.fixture
+def base_dir(tmp_path, monkeypatch):
+    """Media paths resolve against this directory, working directory is elsewhere"""
+    base_dir = tmp_path / "base"
+    (base_dir / "media").mkdir(parents=True)
+    monkeypatch.setattr(images, "BASE_DIR", str(base_dir))
+    monkeypatch.chdir(tmp_path)
+    return base_dir
+
+
+@pytest.mark.parametrize("image_format, extension", [("PNG", ".png"), ("JPEG", ".jpg"),
+                                                     ("GIF", ".gif"), ("BMP", ".bmp")])
+def test_extension_comes_from_detected_format_not_name(base_dir, image_format, extension):
+    save_image(base_dir / "media" / "upload.jpg.exe", image_format)
+
+    assert get_image_extension("media/upload.jpg.exe") == extension
+
+
+def test_file_which_is_not_an_image_is_invalid(base_dir):
+    (base_dir / "media" / "upload.png").write_bytes(b"<script></script>")
+
+    with pytest.raises(INVALID_IMAGE_ERRORS):
+        get_image_extension("media/upload.png")
+
+
+def test_removes_image_and_variants_under_base_dir(base_dir):
+    for name in ("image.png", "image_thumb.webp", "image_thumb.png"):
+        save_image(base_dir / "media" / name, "PNG")
+
+    remove_image("media/image.png", {"thumb": {"webp": "media/image_thumb.webp",
+                                               "fallback": "media/image_thumb.png"}})
+
+    assert list((base_dir / "media").iterdir()) == []
@@ -0,0 +1,165 @@
+import socket
+from datetime import datetime, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.models import EmailOutbox
+from core.settings import MAIL_OUTBOX_MAX_ATTEMPTS
+from utils.mail import outbox
+from utils.mail.outbox import claim_outbox_batch, deliver_outbox_batch, queue_mail
+from utils.mail.send_mail import compose_message
+from utils.mail.smtp import SMTPPool
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages: list[tuple[tuple[str, int], list[str], bytes]] = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos, envelope.content))
+        return "250 Message accepted for delivery"
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_settings(port: int, suppress_send: bool = False) -> ConnectionConfig:
+    return ConnectionConfig(MAIL_USERNAME="", MAIL_PASSWORD="", MAIL_FROM="guidio@example.com",
+                            MAIL_PORT=port, MAIL_SERVER="127.0.0.1", MAIL_STARTTLS=False,
+                            MAIL_SSL_TLS=False, USE_CREDENTIALS=False,
+                            SUPPRESS_SEND=int(suppress_send))
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=get_free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+@pytest.fixture
+async def smtp_pool(smtp_server):
+    pool = SMTPPool(make_settings(smtp_server.port), size=2)
+    yield pool
+    await pool.close()
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(EmailOutbox.__table__.create)
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+def make_message(recipient: str):
+    return compose_message("Hello", [recipient], "<p>Hello</p>")
+
+
+async def test_pool_reuses_connection(smtp_server, smtp_pool):
+    for recipient in ("a@example.com", "b@example.com", "c@example.com"):
+        await smtp_pool.send_message(make_message(recipient))
+
+    messages = smtp_server.handler.messages
+    assert [rcpt_tos for _, rcpt_tos, _ in messages] == [["a@example.com"], ["b@example.com"],
+                                                          ["c@example.com"]]
+    assert len({peer for peer, _, _ in messages}) == 1
+
+
+async def test_pool_reconnects_after_server_restart():
+    handler, port = RecordingHandler(), get_free_port()
+    pool = SMTPPool(make_settings(port), size=1)
+    server = Controller(handler, hostname="127.0.0.1", port=port)
+    server.start()
+    await pool.send_message(make_message("a@example.com"))
+    server.stop()
+    server = Controller(handler, hostname="127.0.0.1", port=port)
+    server.start()
+    try:
+        await pool.send_message(make_message("b@example.com"))
+    finally:
+        await pool.close()
+        server.stop()
+
+    peers = [peer for peer, _, _ in handler.messages]
+    assert len(peers) == 2 and peers[0] != peers[1]
+
+
+async def test_pool_suppresses_send(smtp_server):
+    pool = SMTPPool(make_settings(smtp_server.port, suppress_send=True), size=1)
+
+    await pool.send_message(make_message("a@example.com"))
+
+    assert smtp_server.handler.messages == []
+
+
+async def queue_activation(db: AsyncSession, recipient: str) -> EmailOutbox:
+    email = await queue_mail(db, subject="Activate account", recipients=[recipient],
+                             body={"first_name": "Ana", "url": "https://example.com/activate",
+                                   "expire_at": "2030-01-01 00:00:00"},
+                             template_name="activation_email.html")
+    await db.commit()
+    return email
+
+
+async def test_outbox_delivers_queued_mail(monkeypatch, db, smtp_server, smtp_pool):
+    monkeypatch.setattr(outbox, "smtp_pool", smtp_pool)
+    await queue_activation(db, "a@example.com")
+    await queue_activation(db, "b@example.com")
+
+    assert await deliver_outbox_batch(db) == 2
+
+    messages = smtp_server.handler.messages
+    assert sorted(rcpt_tos[0] for _, rcpt_tos, _ in messages) == ["a@example.com",
+                                                                   "b@example.com"]
+    assert b"https://example.com/activate" in messages[0][2]
+    emails = (await db.execute(select(EmailOutbox))).scalars().all()
+    assert all(email.sent_at is not None and email.attempts == 1 for email in emails)
+    assert await deliver_outbox_batch(db) == 0
+
+
+async def test_outbox_retries_when_server_is_down(monkeypatch, db):
+    monkeypatch.setattr(outbox, "smtp_pool", SMTPPool(make_settings(get_free_port()), size=1))
+    email = await queue_activation(db, "a@example.com")
+
+    assert await deliver_outbox_batch(db) == 1
+
+    assert email.sent_at is None and email.failed_at is None
+    assert email.attempts == 1 and email.last_error
+    assert email.next_attempt_at > datetime.now(timezone.utc)
+    # Not due before the retry delay
+    assert await deliver_outbox_batch(db) == 0
+
+
+async def test_outbox_gives_up_after_max_attempts(monkeypatch, db):
+    monkeypatch.setattr(outbox, "smtp_pool", SMTPPool(make_settings(get_free_port()), size=1))
+    email = await queue_activation(db, "a@example.com")
+    email.attempts = MAIL_OUTBOX_MAX_ATTEMPTS - 1
+    await db.commit()
+
+    await deliver_outbox_batch(db)
+
+    assert email.failed_at is not None and email.attempts == MAIL_OUTBOX_MAX_ATTEMPTS
+
+
+async def test_claimed_mail_is_leased(db):
+    email = await queue_activation(db, "a@example.com")
+
+    assert await claim_outbox_batch(db) == [email]
+
+    assert email.attempts == 1
+    assert await claim_outbox_batch(db) == []
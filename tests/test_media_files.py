@@ -0,0 +1,53 @@
+import os
+
+import httpx
+import pytest
+
+from utils import media_files
+from utils.media_files import MediaFileResponse, RangeNotSatisfiableError, parse_byte_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=999-999", (999, 999)),
+    (" Bytes = 10-19", (10, 19)),
+])
+def test_single_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "bytes=0-1,5-9", "items=0-9", "bytes=9-0", "bytes=a-9", "bytes=5", "bytes=-",
+])
+def test_whole_file_is_sent_when_range_is_missing_or_malformed(header):
+    assert parse_byte_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-2999", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_byte_range(header, 1000)
+
+
+def test_empty_file_can_not_satisfy_any_range():
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_byte_range("bytes=0-", 0)
+
+
+@pytest.mark.anyio
+async def test_accel_redirect_path_is_quoted(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_files, "MEDIA_ROOT", str(tmp_path))
+    (tmp_path / "guides").mkdir()
+    path = tmp_path / "guides" / "cover ä%.jpg"
+    path.write_bytes(b"image")
+    response = MediaFileResponse(str(path), os.stat(path), "no-cache",
+                                 accel_redirect_prefix="/internal/media/")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=response),
+                                 base_url="http://testserver") as client:
+        sent = await client.get("/media/guides/cover.jpg")
+    assert sent.headers["x-accel-redirect"] == "/internal/media/guides/cover%20%C3%A4%25.jpg"
+    assert sent.content == b""
@@ -0,0 +1,66 @@
+import pytest
+
+from users.schemas import ProfessionReadSchema
+from utils.professions import ProfessionIndex
+
+PROFESSIONS = ["Data Engineer", "Software Engineer", "Engineering Manager", "Reverse Engineer",
+               "Designer"]
+
+
+@pytest.fixture
+def index() -> ProfessionIndex:
+    profession_index = ProfessionIndex()
+    profession_index.load([ProfessionReadSchema(profession_id=profession_id, name=name)
+                           for profession_id, name in enumerate(PROFESSIONS, start=1)])
+    return profession_index
+
+
+def names(professions: list[ProfessionReadSchema]) -> list[str]:
+    return [profession.name for profession in professions]
+
+
+def test_index_is_empty_until_loaded():
+    profession_index = ProfessionIndex()
+
+    assert not profession_index.loaded
+    assert profession_index.search("eng") == [] and profession_index.get(1) is None
+
+
+def test_name_prefix_ranks_before_word_prefix(index):
+    assert names(index.search("eng")) == ["Engineering Manager", "Data Engineer",
+                                          "Reverse Engineer", "Software Engineer"]
+
+
+def test_substring_ranks_last(index):
+    assert names(index.search("sign")) == ["Designer"]
+    assert names(index.search("e")) == ["Engineering Manager", "Data Engineer",
+                                        "Reverse Engineer", "Software Engineer", "Designer"]
+
+
+def test_substring_inside_words(index):
+    assert names(index.search("gineer")) == ["Data Engineer", "Engineering Manager",
+                                             "Reverse Engineer", "Software Engineer"]
+    assert names(index.search("a eng")) == ["Data Engineer"]
+
+
+def test_search_ignores_case_and_surrounding_spaces(index):
+    assert names(index.search("  SOFT ")) == ["Software Engineer"]
+
+
+def test_empty_search_returns_all_alphabetically(index):
+    assert names(index.search("")) == sorted(PROFESSIONS)
+
+
+def test_no_match(index):
+    assert index.search("doctor") == []
+
+
+def test_get_by_id(index):
+    assert index.get(2).name == "Software Engineer"
+    assert index.get(100) is None
+
+
+def test_reload_replaces_index(index):
+    index.load([ProfessionReadSchema(profession_id=9, name="Doctor")])
+
+    assert names(index.search("")) == ["Doctor"] and index.get(1) is None
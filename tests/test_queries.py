@@ -0,0 +1,149 @@
+"""Query plans and query counts of list and detail paths, against a real PostgreSQL database"""
+import json
+from typing import Iterator
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from auth.service import get_user_by_email
+from guides.service import get_guide_detail, get_list_of_guides
+from tests.database import TEST_DATABASE_URL, create_seeded_engine, record_queries
+from users.schemas import UserReadSchema
+from users.service import get_paginated_instructors, get_paginated_instructors_by_search, \
+    get_user_profile_by_id
+from utils.guides import encode_guides_cursor
+
+USERS = 2000
+GUIDES_PER_USER = 20
+PAGE_SIZE = 10
+
+pytestmark = [pytest.mark.anyio,
+              pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")]
+
+
+@pytest.fixture(scope="module")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="module")
+async def engine() -> AsyncEngine:
+    engine = await create_seeded_engine(USERS, GUIDES_PER_USER)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(engine) -> AsyncSession:
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+
+
+async def explain(db: AsyncSession, query: tuple[str, tuple]) -> dict:
+    statement, parameters = query
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = result.scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def index_names(plan: dict) -> set[str]:
+    return {node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node}
+
+
+def has_sort(plan: dict) -> bool:
+    return any(node["Node Type"] in ("Sort", "Incremental Sort") for node in plan_nodes(plan))
+
+
+async def test_published_guides_keyset_page_reads_index_in_order(engine, db):
+    first_page = await get_list_of_guides(db, page=0, page_size=PAGE_SIZE, include_total=False)
+    last = first_page.guides[-1]
+    with record_queries(engine) as queries:
+        await get_list_of_guides(db, page=0, page_size=PAGE_SIZE, include_total=False,
+                                 after=encode_guides_cursor(last.last_modified, last.guide_id))
+
+    plan = await explain(db, queries[0])
+    assert "ix_guide_published_last_modified" in index_names(plan)
+    assert not has_sort(plan)
+
+
+async def test_user_guides_keyset_page_reads_index_in_order(engine, db):
+    first_page = await get_list_of_guides(db, page=0, page_size=PAGE_SIZE, include_total=False,
+                                          published_only=False, user_id=7)
+    last = first_page.guides[-1]
+    with record_queries(engine) as queries:
+        await get_list_of_guides(db, page=0, page_size=PAGE_SIZE, include_total=False,
+                                 published_only=False, user_id=7,
+                                 after=encode_guides_cursor(last.last_modified, last.guide_id))
+
+    plan = await explain(db, queries[0])
+    assert "ix_guide_user_id_last_modified_guide_id" in index_names(plan)
+    assert not has_sort(plan)
+
+
+async def test_instructors_page_reads_partial_index(engine, db):
+    with record_queries(engine) as queries:
+        await get_paginated_instructors(db, 0, PAGE_SIZE, include_total=False)
+
+    assert "ix_user_detail_instructor_user_id" in index_names(await explain(db, queries[0]))
+
+
+async def test_guides_page_is_one_query(engine, db):
+    with record_queries(engine) as queries:
+        guides = await get_list_of_guides(db, page=2, page_size=PAGE_SIZE, include_total=False)
+
+    assert len(guides.guides) == PAGE_SIZE
+    assert all(guide.user.profession for guide in guides.guides)
+    assert len(queries) == 1
+
+
+async def test_guide_detail_is_one_query(engine, db):
+    with record_queries(engine) as queries:
+        guide = await get_guide_detail(db, 1)
+
+    assert guide.user.user_details.profession.name == "Designer"
+    assert len(queries) == 1
+
+
+async def test_instructors_page_is_one_query(engine, db):
+    with record_queries(engine) as queries:
+        instructors = await get_paginated_instructors(db, 1, PAGE_SIZE, include_total=False)
+        users = [UserReadSchema.model_validate(user) for user in instructors.users]
+
+    assert len(users) == PAGE_SIZE
+    assert all(user.user_details.profession.name == "Data Engineer" for user in users)
+    assert len(queries) == 1
+
+
+async def test_instructors_search_page_is_one_query(engine, db):
+    with record_queries(engine) as queries:
+        instructors = await get_paginated_instructors_by_search(db, 0, PAGE_SIZE, "First1")
+        users = [UserReadSchema.model_validate(user) for user in instructors.users]
+
+    assert users and all(user.user_details.is_instructor for user in users)
+    assert all(user.user_details.profession for user in users)
+    assert len(queries) == 1
+
+
+async def test_user_profile_is_one_query(engine, db):
+    with record_queries(engine) as queries:
+        user = UserReadSchema.model_validate(await get_user_profile_by_id(3, db))
+
+    assert user.user_details.profession.name == "Designer"
+    assert len(queries) == 1
+
+
+async def test_user_by_email_loads_only_user(engine, db):
+    with record_queries(engine) as queries:
+        user = await get_user_by_email("user5@example.com", db)
+
+    assert "user_details" in inspect(user).unloaded
+    assert len(queries) == 1
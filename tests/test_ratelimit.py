@@ -0,0 +1,124 @@
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from auth import service as auth_service
+from core.dependencies import get_db
+from core.exceptions import TooManyRequestsException
+from core.models import Profession, User, UserDetail
+from core.ratelimit import InMemoryTokenBuckets, RateLimiter
+from core.settings import LOGIN_EMAIL_RATE_LIMIT_CAPACITY, LOGIN_IP_RATE_LIMIT_CAPACITY
+from main import app
+from src.config import FORWARDED_ALLOW_IPS
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def login_buckets(monkeypatch) -> None:
+    buckets = InMemoryTokenBuckets(maxsize=100)
+    monkeypatch.setattr(auth_service.login_ip_limiter, "buckets", buckets)
+    monkeypatch.setattr(auth_service.login_email_limiter, "buckets", buckets)
+
+
+@pytest.fixture
+async def login_client(clock, login_buckets) -> httpx.AsyncClient:
+    """Client of the app behind a trusted proxy, as uvicorn runs it, with empty user tables"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        # Indexes are left out, some of them exist only in PostgreSQL
+        for table in (Profession.__table__, User.__table__, UserDetail.__table__):
+            await connection.execute(CreateTable(table))
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_test_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_test_db
+    transport = httpx.ASGITransport(app=ProxyHeadersMiddleware(app, FORWARDED_ALLOW_IPS),
+                                    client=("127.0.0.1", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+    app.dependency_overrides.pop(get_db)
+    await engine.dispose()
+
+
+async def login(client: httpx.AsyncClient, forwarded_for: str, email: str) -> httpx.Response:
+    return await client.post("/auth/login", json={"email": email, "password": "Passw0rd!x"},
+                             headers={"X-Forwarded-For": forwarded_for})
+
+
+async def test_bucket_allows_capacity_then_waits_for_refill(clock):
+    buckets = InMemoryTokenBuckets(maxsize=10)
+
+    assert [await buckets.take("key", 3, 1 / 10) for _ in range(3)] == [0, 0, 0]
+    assert await buckets.take("key", 3, 1 / 10) == pytest.approx(10)
+    clock.now += 10
+    assert await buckets.take("key", 3, 1 / 10) == 0
+
+
+async def test_bucket_refills_up_to_capacity(clock):
+    buckets = InMemoryTokenBuckets(maxsize=10)
+    await buckets.take("key", 2, 1)
+
+    clock.now += 60
+
+    assert [await buckets.take("key", 2, 1) for _ in range(2)] == [0, 0]
+    assert await buckets.take("key", 2, 1) > 0
+
+
+async def test_buckets_are_separate_per_key(clock):
+    buckets = InMemoryTokenBuckets(maxsize=10)
+    await buckets.take("a", 1, 1 / 60)
+
+    assert await buckets.take("a", 1, 1 / 60) > 0
+    assert await buckets.take("b", 1, 1 / 60) == 0
+
+
+async def test_least_recently_used_bucket_is_dropped(clock):
+    buckets = InMemoryTokenBuckets(maxsize=2)
+    await buckets.take("a", 1, 1 / 60)
+    await buckets.take("b", 1, 1 / 60)
+
+    await buckets.take("c", 1, 1 / 60)
+
+    # Dropped bucket starts full again
+    assert await buckets.take("a", 1, 1 / 60) == 0
+    assert await buckets.take("c", 1, 1 / 60) > 0
+
+
+async def test_rate_limiter_rejects_with_retry_after(clock):
+    limiter = RateLimiter("login", capacity=1, refill_rate=1 / 30,
+                          buckets=InMemoryTokenBuckets(maxsize=10))
+    await limiter.check("key")
+
+    with pytest.raises(TooManyRequestsException) as error:
+        await limiter.check("key")
+
+    assert error.value.headers["Retry-After"] == "30"
+    assert limiter.stats() == {"rejected": 1}
+
+
+async def test_login_email_is_limited_across_forwarded_clients(login_client):
+    for number in range(LOGIN_EMAIL_RATE_LIMIT_CAPACITY):
+        response = await login(login_client, f"203.0.113.{number}", "User@example.com")
+        assert response.status_code != 429
+
+    response = await login(login_client, "198.51.100.1", " user@example.com")
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+async def test_login_client_is_limited_by_forwarded_address(login_client):
+    for number in range(LOGIN_IP_RATE_LIMIT_CAPACITY):
+        response = await login(login_client, "203.0.113.1", f"user{number}@example.com")
+        assert response.status_code != 429
+
+    assert (await login(login_client, "203.0.113.1", "other@example.com")).status_code == 429
+    # Other clients behind the same proxy have buckets of their own
+    assert (await login(login_client, "203.0.113.2", "other@example.com")).status_code != 429